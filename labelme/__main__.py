@@ -54,6 +54,19 @@ def main():
         help="stop storing image data to JSON file",
         default=argparse.SUPPRESS,
     )
+    parser.add_argument(
+        "--datafile",
+        dest="data_file",
+        action="store_true",
+        help="store image data and masks to a binary file next to JSON file",
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        "--labelstore",
+        dest="label_store",
+        help="database file to store label files instead of JSON files",
+        default=argparse.SUPPRESS,
+    )
     parser.add_argument(
         "--autosave",
         dest="auto_save",
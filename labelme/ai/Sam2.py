@@ -1,74 +1,32 @@
-import collections
-import threading
-
 import imgviz
 import numpy as np
-import onnxruntime
-import skimage
 
-from ..logger import logger
+from . import _base
 from . import _utils
 
 
-class SegmentAnythingModel2:
+class SegmentAnythingModel2(_base._PromptableModel):
     def __init__(self, encoder_path, decoder_path):
         self._image_size = 1024
+        super().__init__(encoder_path=encoder_path, decoder_path=decoder_path)
 
-        self._encoder_session = onnxruntime.InferenceSession(encoder_path)
-        self._decoder_session = onnxruntime.InferenceSession(decoder_path)
-
-        self._lock = threading.Lock()
-        self._image_embedding_cache = collections.OrderedDict()
-
-        self._thread = None
-
-    def set_image(self, image: np.ndarray):
-        with self._lock:
-            self._image = image
-            self._image_embedding = self._image_embedding_cache.get(
-                self._image.tobytes()
-            )
-
-        if self._image_embedding is None:
-            self._thread = threading.Thread(
-                target=self._compute_and_cache_image_embedding
-            )
-            self._thread.start()
-
-    def _compute_and_cache_image_embedding(self):
-        with self._lock:
-            logger.debug("Computing image embedding...")
-            self._image_embedding = _compute_image_embedding(
-                image_size=self._image_size,
-                encoder_session=self._encoder_session,
-                image=self._image,
-            )
-            if len(self._image_embedding_cache) > 10:
-                self._image_embedding_cache.popitem(last=False)
-            self._image_embedding_cache[self._image.tobytes()] = self._image_embedding
-            logger.debug("Done computing image embedding.")
-
-    def _get_image_embedding(self):
-        if self._thread is not None:
-            self._thread.join()
-            self._thread = None
-        with self._lock:
-            return self._image_embedding
-
-    def predict_mask_from_points(self, points, point_labels):
+    def _compute_image_embedding(self, image):
+        return _compute_image_embedding(
+            image_size=self._image_size,
+            encoder_session=self._encoder_session,
+            image=image,
+        )
+
+    def _compute_mask_from_points(self, image, image_embedding, points, point_labels):
         return _compute_mask_from_points(
             image_size=self._image_size,
             decoder_session=self._decoder_session,
-            image=self._image,
-            image_embedding=self._get_image_embedding(),
+            image=image,
+            image_embedding=image_embedding,
             points=points,
             point_labels=point_labels,
         )
 
-    def predict_polygon_from_points(self, points, point_labels):
-        mask = self.predict_mask_from_points(points=points, point_labels=point_labels)
-        return _utils.compute_polygon_from_mask(mask=mask)
-
 
 def _compute_scale_to_resize_image(image_size, image):
     height, width = image.shape[:2]
@@ -149,18 +107,14 @@ def _compute_mask_from_points(
         "point_labels": onnx_label,
         "mask_input": onnx_mask_input,
         "has_mask_input": onnx_has_mask_input,
-        "orig_im_size": np.array(image.shape[:2], dtype=np.float32),
+        # logits at the resolution of the resized image rather than the image,
+        # which are upsampled only around the mask
+        "orig_im_size": np.array(
+            _utils.get_reduced_size(image.shape, max_size=image_size),
+            dtype=np.float32,
+        ),
     }
 
     masks, _, _ = decoder_session.run(None, decoder_inputs)
-    mask = masks[0, 0]  # (1, 1, H, W) -> (H, W)
-    mask = mask > 0.0
-
-    MIN_SIZE_RATIO = 0.05
-    skimage.morphology.remove_small_objects(
-        mask, min_size=mask.sum() * MIN_SIZE_RATIO, out=mask
-    )
-
-    if 0:
-        imgviz.io.imsave("mask.jpg", imgviz.label2rgb(mask, imgviz.rgb2gray(image)))
-    return mask
+    logits = masks[0, 0]  # (1, 1, H, W) -> (H, W)
+    return _utils.compute_mask_from_logits(logits, image_shape=image.shape)
@@ -0,0 +1,208 @@
+import collections
+import threading
+
+import numpy as np
+
+from ..logger import logger
+from . import _embedding_cache
+from . import _session
+from . import _tiling
+from . import _utils
+
+
+class _ImageState(object):
+    # an image set to a model and its embedding, which predictions take once
+    # so that they are not mixed with an image set meanwhile
+    def __init__(self, image, key, tiled):
+        self.image = image
+        self.key = key
+        self.tiled = tiled
+        self.embedding = None
+        self.thread = None  # computing the embedding, set only by set_image
+
+    def get_embedding(self):
+        if self.thread is not None:
+            self.thread.join()
+        return self.embedding
+
+
+class _PromptableModel(object):
+    # image embeddings, tiling and caches of models predicting masks from
+    # prompt points, whose subclasses only define _compute_image_embedding
+    # and _compute_mask_from_points
+
+    def __init__(self, encoder_path, decoder_path):
+        self._encoder_session = _session.create_session(encoder_path)
+        self._decoder_session = _session.create_session(decoder_path)
+
+        # guards the states and the memory cache, and is not held while
+        # encoding, so that set_image does not wait for the encoder
+        self._lock = threading.Lock()
+        # serializes encoding, which uses all cores by itself
+        self._encoder_lock = threading.Lock()
+        self._state = None
+        self._pending_states = {}  # key -> state whose embedding is computed
+        self._image_embedding_cache = collections.OrderedDict()
+        # decoder results keyed by image and prompt, as the same prompt is
+        # predicted for preview and again on finalise
+        self._prediction_cache = _utils.LRUCache(maxsize=32)
+
+    @property
+    def _model_name(self):
+        return getattr(self, "name", type(self).__name__)
+
+    def _compute_image_embedding(self, image):
+        raise NotImplementedError
+
+    def _compute_mask_from_points(self, image, image_embedding, points, point_labels):
+        # returns the bounding box (x1, y1, x2, y2) of the mask in the image and
+        # the mask cropped by it
+        raise NotImplementedError
+
+    def set_image(self, image: np.ndarray):
+        key = _embedding_cache.compute_image_key(image)
+        with self._lock:
+            state = self._pending_states.get(key)
+            if state is None:
+                state = _ImageState(
+                    image=image, key=key, tiled=_tiling.is_tiled(image.shape)
+                )
+                state.embedding = self._image_embedding_cache.get(key)
+                # tiles are encoded on prediction, as they are selected by prompts
+                if state.embedding is None and not state.tiled:
+                    state.thread = threading.Thread(
+                        target=self._compute_and_cache_image_embedding, args=(state,)
+                    )
+                    self._pending_states[key] = state
+                    state.thread.start()
+            self._state = state
+
+    def _get_state(self):
+        with self._lock:
+            state = self._state
+        if state is None:
+            raise RuntimeError("Image is not set")
+        return state
+
+    def _cache_image_embedding(self, key, image_embedding):
+        with self._lock:
+            if len(self._image_embedding_cache) > 10:
+                self._image_embedding_cache.popitem(last=False)
+            self._image_embedding_cache[key] = image_embedding
+
+    def _compute_and_cache_image_embedding(self, state):
+        try:
+            embedding_cache = _embedding_cache.get_embedding_cache()
+            image_embedding = embedding_cache.get(self._model_name, state.key)
+            if image_embedding is None:
+                logger.debug("Computing image embedding...")
+                with self._encoder_lock:
+                    image_embedding = self._compute_image_embedding(state.image)
+                embedding_cache.put(self._model_name, state.key, image_embedding)
+            state.embedding = image_embedding
+            self._cache_image_embedding(state.key, image_embedding)
+            logger.debug("Done computing image embedding.")
+        finally:
+            with self._lock:
+                self._pending_states.pop(state.key, None)
+
+    def wait_image_embedding(self):
+        # waits for the embedding of the current image, if being computed
+        with self._lock:
+            state = self._state
+        if state is not None:
+            state.get_embedding()
+
+    def prefetch(self, image: np.ndarray):
+        # computes the embedding of an image that is likely set next and stores
+        # it only in the disk cache, so that the memory cache is not affected
+        if _tiling.is_tiled(image.shape):
+            return
+        key = _embedding_cache.compute_image_key(image)
+        with self._lock:
+            if key in self._image_embedding_cache or key in self._pending_states:
+                return
+        embedding_cache = _embedding_cache.get_embedding_cache()
+        if embedding_cache.get(self._model_name, key) is not None:
+            return
+        logger.debug("Prefetching image embedding...")
+        with self._encoder_lock:
+            embedding = self._compute_image_embedding(image)
+        embedding_cache.put(self._model_name, key, embedding)
+
+    def _get_tile_embedding(self, state, box):
+        key = _tiling.get_tile_key(state.key, box)
+        with self._lock:
+            image_embedding = self._image_embedding_cache.get(key)
+        if image_embedding is not None:
+            return image_embedding
+
+        embedding_cache = _embedding_cache.get_embedding_cache()
+        image_embedding = embedding_cache.get(self._model_name, key)
+        if image_embedding is None:
+            logger.debug("Computing image embedding of tile {}...".format(box))
+            x1, y1, x2, y2 = box
+            with self._encoder_lock:
+                image_embedding = self._compute_image_embedding(
+                    state.image[y1:y2, x1:x2]
+                )
+            embedding_cache.put(self._model_name, key, image_embedding)
+        self._cache_image_embedding(key, image_embedding)
+        return image_embedding
+
+    def _predict_mask(self, state, points, point_labels):
+        # returns the bounding box (x1, y1, x2, y2) of the mask in the image and
+        # the mask cropped by it
+        key = ("mask", state.key, points, point_labels)
+        result = self._prediction_cache.get(key)
+        if result is not None:
+            return result
+
+        if state.tiled:
+            box = _tiling.get_tile_box(state.image.shape, points)
+            image_embedding = self._get_tile_embedding(state, box)
+            image = state.image[box[1] : box[3], box[0] : box[2]]
+            offset = np.array(box[:2], dtype=np.float64)
+        else:
+            image_embedding = state.get_embedding()
+            if image_embedding is None:
+                raise RuntimeError("Failed to compute image embedding")
+            image = state.image
+            offset = np.zeros((2,), dtype=np.float64)
+        bbox, mask = self._compute_mask_from_points(
+            image=image,
+            image_embedding=image_embedding,
+            points=np.array(points) - offset,
+            point_labels=point_labels,
+        )
+        if mask.size:
+            x, y = offset.astype(int)
+            bbox = (bbox[0] + x, bbox[1] + y, bbox[2] + x, bbox[3] + y)
+        result = (bbox, mask)
+        self._prediction_cache.put(key, result)
+        return result
+
+    def predict_mask_from_points(self, points, point_labels):
+        # returns the bounding box (x1, y1, x2, y2) of the mask and the mask
+        # cropped by it, which is empty if nothing is predicted
+        return self._predict_mask(
+            self._get_state(),
+            points=_utils.quantize_points(points),
+            point_labels=tuple(point_labels),
+        )
+
+    def predict_polygon_from_points(self, points, point_labels):
+        state = self._get_state()
+        points = _utils.quantize_points(points)
+        point_labels = tuple(point_labels)
+        key = ("polygon", state.key, points, point_labels)
+        polygon = self._prediction_cache.get(key)
+        if polygon is None:
+            bbox, mask = self._predict_mask(
+                state, points=points, point_labels=point_labels
+            )
+            polygon = _utils.compute_polygon_from_mask(mask=mask) + bbox[:2]
+            height, width = state.image.shape[:2]
+            polygon = np.clip(polygon, (0, 0), (width - 1, height - 1))
+            self._prediction_cache.put(key, polygon)
+        return polygon
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import os.path as osp
+import re
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from ..logger import logger
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_CACHE_DIR = osp.join(
+    os.environ.get("XDG_CACHE_HOME", osp.join(osp.expanduser("~"), ".cache")),
+    "labelme",
+    "embeddings",
+)
+DEFAULT_MAX_SIZE = 10 * 1024**3  # bytes
+
+
+# id(image) -> (weakref of image, key), so that the key of an image is computed
+# once and shared by all models
+_image_keys = {}
+_image_keys_lock = threading.Lock()
+
+
+def _hash_image(image):
+    if xxhash is not None:
+        h = xxhash.xxh3_128()
+    else:
+        h = hashlib.blake2b(digest_size=16)
+    h.update("{}:{}".format(image.shape, image.dtype).encode("utf-8"))
+    # hashed through the buffer without copying unless it is not contiguous
+    h.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+    return h.hexdigest()
+
+
+def compute_image_key(image):
+    # images are assumed not to be modified in place once a key is computed
+    image_id = id(image)
+    with _image_keys_lock:
+        entry = _image_keys.get(image_id)
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+
+    key = _hash_image(image)
+
+    def remove(_, image_id=image_id):
+        with _image_keys_lock:
+            _image_keys.pop(image_id, None)
+
+    try:
+        ref = weakref.ref(image, remove)
+    except TypeError:
+        return key
+    with _image_keys_lock:
+        _image_keys[image_id] = (ref, key)
+    return key
+
+
+class EmbeddingCache(object):
+    # image embeddings stored as .npy files under {cache_dir}/{model}/{key}.npy
+    # and evicted in least recently used order when exceeding max_size
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def _get_path(self, model_name, key):
+        model_dir = re.sub(r"[^0-9A-Za-z_.-]+", "_", model_name).strip("_")
+        return osp.join(self.cache_dir, model_dir, key + ".npy")
+
+    def get(self, model_name, key):
+        path = self._get_path(model_name, key)
+        if not osp.exists(path):
+            return None
+        try:
+            embedding = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to load cached embedding {}: {}".format(path, e))
+            return None
+        return embedding
+
+    def put(self, model_name, key, embedding):
+        path = self._get_path(model_name, key)
+        try:
+            if not osp.exists(osp.dirname(path)):
+                os.makedirs(osp.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".npy.tmp", dir=osp.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, embedding)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning("Failed to cache embedding {}: {}".format(path, e))
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for root, dirs, files in os.walk(self.cache_dir):
+                for file in files:
+                    if not file.endswith(".npy"):
+                        continue
+                    path = osp.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            size = sum(entry[1] for entry in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+
+
+# see ai.embedding_cache in labelme/config/default_config.yaml
+DEFAULT_CONFIG = {
+    "dir": None,  # DEFAULT_CACHE_DIR
+    "max_size": DEFAULT_MAX_SIZE / 1024**3,  # GiB
+}
+
+_embedding_cache = None
+
+
+def configure(config):
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    if config["max_size"] <= 0:
+        raise ValueError("Unexpected max_size: {}".format(config["max_size"]))
+    set_embedding_cache(
+        EmbeddingCache(
+            cache_dir=osp.expanduser(config["dir"] or DEFAULT_CACHE_DIR),
+            max_size=int(config["max_size"] * 1024**3),
+        )
+    )
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def set_embedding_cache(embedding_cache):
+    global _embedding_cache
+    _embedding_cache = embedding_cache
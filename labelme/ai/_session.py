@@ -0,0 +1,168 @@
+import hashlib
+import os
+import os.path as osp
+import tempfile
+
+from ..logger import logger
+
+# see ai.onnxruntime in labelme/config/default_config.yaml
+DEFAULT_CONFIG = {
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    "execution_mode": "sequential",
+    "graph_optimization_level": "all",
+    "enable_cpu_mem_arena": True,
+    "enable_mem_pattern": True,
+    "allow_spinning": True,
+    "optimized_model_dir": None,
+    "providers": ["CPUExecutionProvider"],
+}
+
+# names of onnxruntime enums, as onnxruntime is imported on creating sessions
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+_config = dict(DEFAULT_CONFIG)
+
+
+def configure(config):
+    global _config
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    if config["execution_mode"] not in EXECUTION_MODES:
+        raise ValueError(
+            "Unexpected execution_mode: {}".format(config["execution_mode"])
+        )
+    if config["graph_optimization_level"] not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(
+            "Unexpected graph_optimization_level: {}".format(
+                config["graph_optimization_level"]
+            )
+        )
+    _config = config
+
+
+def get_providers(config=None):
+    import onnxruntime
+
+    # providers are given as names or mappings from a name to its options:
+    # e.g., [{CPUExecutionProvider: {arena_extend_strategy: kSameAsRequested}}]
+    config = _config if config is None else config
+    available_providers = onnxruntime.get_available_providers()
+    providers = []
+    for provider in config["providers"]:
+        if isinstance(provider, dict):
+            ((name, options),) = provider.items()
+            options = {k: str(v) for k, v in (options or {}).items()}
+        else:
+            name, options = provider, {}
+        if name not in available_providers:
+            logger.warning("Skipping unavailable execution provider: %s", name)
+            continue
+        providers.append((name, options))
+    if not providers:
+        providers.append(("CPUExecutionProvider", {}))
+    return providers
+
+
+def get_session_options(config=None):
+    import onnxruntime
+
+    config = _config if config is None else config
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = config["intra_op_num_threads"]
+    sess_options.inter_op_num_threads = config["inter_op_num_threads"]
+    sess_options.execution_mode = getattr(
+        onnxruntime.ExecutionMode, EXECUTION_MODES[config["execution_mode"]]
+    )
+    sess_options.graph_optimization_level = getattr(
+        onnxruntime.GraphOptimizationLevel,
+        GRAPH_OPTIMIZATION_LEVELS[config["graph_optimization_level"]],
+    )
+    sess_options.enable_cpu_mem_arena = config["enable_cpu_mem_arena"]
+    sess_options.enable_mem_pattern = config["enable_mem_pattern"]
+    allow_spinning = "1" if config["allow_spinning"] else "0"
+    sess_options.add_session_config_entry(
+        "session.intra_op.allow_spinning", allow_spinning
+    )
+    sess_options.add_session_config_entry(
+        "session.inter_op.allow_spinning", allow_spinning
+    )
+    return sess_options
+
+
+def _get_optimized_model_path(model_path, config, providers):
+    import onnxruntime
+
+    # optimized models depend on the optimization level, the providers and
+    # even the hardware, so they are not shared across such differences
+    stat = os.stat(model_path)
+    h = hashlib.md5()
+    for value in [
+        osp.abspath(model_path),
+        stat.st_size,
+        stat.st_mtime,
+        config["graph_optimization_level"],
+        providers,
+        onnxruntime.__version__,
+    ]:
+        h.update(repr(value).encode("utf-8"))
+    stem = osp.splitext(osp.basename(model_path))[0]
+    return osp.join(
+        osp.expanduser(config["optimized_model_dir"]),
+        "{}.{}.onnx".format(stem, h.hexdigest()),
+    )
+
+
+def create_session(model_path):
+    import onnxruntime
+
+    config = _config
+    sess_options = get_session_options(config)
+    providers = get_providers(config)
+
+    if not config["optimized_model_dir"]:
+        return onnxruntime.InferenceSession(
+            model_path, sess_options=sess_options, providers=providers
+        )
+
+    optimized_model_path = _get_optimized_model_path(model_path, config, providers)
+    if osp.exists(optimized_model_path):
+        logger.debug("Loading optimized model: %s", optimized_model_path)
+        sess_options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        )
+        try:
+            return onnxruntime.InferenceSession(
+                optimized_model_path, sess_options=sess_options, providers=providers
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to load optimized model {}: {}".format(optimized_model_path, e)
+            )
+            sess_options = get_session_options(config)
+
+    os.makedirs(osp.dirname(optimized_model_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".onnx.tmp", dir=osp.dirname(optimized_model_path)
+    )
+    os.close(fd)
+    sess_options.optimized_model_filepath = tmp_path
+    try:
+        session = onnxruntime.InferenceSession(
+            model_path, sess_options=sess_options, providers=providers
+        )
+        os.replace(tmp_path, optimized_model_path)
+    finally:
+        if osp.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.debug("Saved optimized model: %s", optimized_model_path)
+    return session
@@ -0,0 +1,55 @@
+import math
+
+# see ai.tiling in labelme/config/default_config.yaml
+DEFAULT_CONFIG = {
+    "min_image_size": 4096,
+    "tile_size": 1024,
+}
+
+_config = dict(DEFAULT_CONFIG)
+
+
+def configure(config):
+    global _config
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    if config["tile_size"] < 2:
+        raise ValueError("Unexpected tile_size: {}".format(config["tile_size"]))
+    _config = config
+
+
+def is_tiled(image_shape):
+    # images larger than min_image_size are encoded in tiles at their native
+    # resolution instead of being downsized as a whole
+    min_image_size = _config["min_image_size"]
+    return min_image_size is not None and max(image_shape[:2]) > min_image_size
+
+
+def get_tile_box(image_shape, points):
+    # tiles are on a grid with the stride of half the tile size, so that tiles
+    # and their embeddings are reused for nearby prompts. the tile is enlarged
+    # by the stride until the points are at least a half stride from its edges
+    height, width = image_shape[:2]
+    tile_size = _config["tile_size"]
+    stride = tile_size // 2
+
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    extent = max(max(xs) - min(xs), max(ys) - min(ys))
+    size = tile_size
+    if extent > size - stride:
+        size += int(math.ceil((extent - (size - stride)) / stride)) * stride
+
+    box = []
+    for center, length in [
+        ((min(xs) + max(xs)) / 2, width),
+        ((min(ys) + max(ys)) / 2, height),
+    ]:
+        start = int(round((center - size / 2) / stride)) * stride
+        start = max(0, min(start, length - size))
+        box.append((start, min(start + size, length)))
+    (x1, x2), (y1, y2) = box
+    return x1, y1, x2, y2
+
+
+def get_tile_key(image_key, box):
+    return "{}-{}-{}-{}-{}".format(image_key, *box)
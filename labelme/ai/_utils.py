@@ -1,38 +1,238 @@
-import imgviz
+import collections
+import threading
+import weakref
+
 import numpy as np
 import skimage
 
 from labelme.logger import logger
 
 
+class LRUCache(object):
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+
+
+def quantize_points(points, step=0.25):
+    # points closer than step give the same key of prediction caches, and are
+    # passed to the decoder quantized so that cached results are exact
+    points = np.round(np.asarray(points, dtype=np.float64) / step) * step
+    return tuple(tuple(point) for point in points.tolist())
+
+
+def get_reduced_size(image_shape, max_size=1024):
+    # size of masks predicted by decoders, which is at most the resolution of
+    # the image embedding, as larger ones are only interpolated from it
+    height, width = image_shape[:2]
+    scale = min(1.0, max_size / max(height, width))
+    return max(1, int(round(height * scale))), max(1, int(round(width * scale)))
+
+
+def _get_bilinear_weights(size, scale, start, stop):
+    # sampling positions in the logits for pixels in [start, stop) of the
+    # image, in the same way as bilinear interpolation of torch and onnx
+    coords = (np.arange(start, stop) + 0.5) * scale - 0.5
+    coords = np.clip(coords, 0, size - 1)
+    i0 = np.floor(coords).astype(np.int64)
+    i1 = np.minimum(i0 + 1, size - 1)
+    return i0, i1, coords - i0
+
+
+def _get_bbox(mask):
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask[rows[0] : rows[-1] + 1].any(axis=0))
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+
+def compute_mask_from_logits(logits, image_shape, min_size_ratio=0.05):
+    # returns the bounding box (x1, y1, x2, y2) of the mask in the image and
+    # the mask cropped by it, upsampling only the region of the mask from the
+    # logits predicted at a reduced size
+    height, width = image_shape[:2]
+    bbox = _get_bbox(logits > 0)
+    if bbox is None:
+        return (0, 0, 0, 0), np.zeros((0, 0), dtype=bool)
+    scale_y = logits.shape[0] / height
+    scale_x = logits.shape[1] / width
+
+    # pixels out of the bounding box enlarged by 1 are interpolated only from
+    # non-positive logits
+    x1, y1, x2, y2 = bbox
+    x1 = max(0, int(np.floor((x1 - 0.5) / scale_x)))
+    y1 = max(0, int(np.floor((y1 - 0.5) / scale_y)))
+    x2 = min(width, int(np.ceil((x2 + 0.5) / scale_x)))
+    y2 = min(height, int(np.ceil((y2 + 0.5) / scale_y)))
+
+    y0s, y1s, wy = _get_bilinear_weights(logits.shape[0], scale_y, y1, y2)
+    x0s, x1s, wx = _get_bilinear_weights(logits.shape[1], scale_x, x1, x2)
+    rows = logits[y0s] * (1 - wy[:, None]) + logits[y1s] * wy[:, None]
+    logits = rows[:, x0s] * (1 - wx) + rows[:, x1s] * wx
+
+    mask = logits > 0
+    skimage.morphology.remove_small_objects(
+        mask, min_size=mask.sum() * min_size_ratio, out=mask
+    )
+    bbox = _get_bbox(mask)
+    if bbox is None:
+        return (0, 0, 0, 0), np.zeros((0, 0), dtype=bool)
+    mask_x1, mask_y1, mask_x2, mask_y2 = bbox
+    mask = np.ascontiguousarray(mask[mask_y1:mask_y2, mask_x1:mask_x2])
+    return (
+        (
+            int(x1 + mask_x1),
+            int(y1 + mask_y1),
+            int(x1 + mask_x2),
+            int(y1 + mask_y2),
+        ),
+        mask,
+    )
+
+
+# see ai.polygon in labelme/config/default_config.yaml
+DEFAULT_POLYGON_CONFIG = {
+    "backend": "auto",  # auto, skimage or opencv
+    "tolerance": 0.004,  # relative to the size of the contour
+}
+
+POLYGON_BACKENDS = ["auto", "skimage", "opencv"]
+
+_polygon_config = dict(DEFAULT_POLYGON_CONFIG)
+
+# id(mask) -> (weakref of mask, config, polygon), as the polygon of the same
+# mask is requested on every paint while the prompt is unchanged
+_polygons = {}
+_polygons_lock = threading.Lock()
+
+_cv2 = None
+
+
+def configure_polygon(config):
+    global _polygon_config
+    config = dict(DEFAULT_POLYGON_CONFIG, **(config or {}))
+    if config["backend"] not in POLYGON_BACKENDS:
+        raise ValueError("Unexpected backend: {}".format(config["backend"]))
+    if config["tolerance"] < 0:
+        raise ValueError("Unexpected tolerance: {}".format(config["tolerance"]))
+    _polygon_config = config
+
+
+def _get_cv2():
+    # opencv is optional and imported on first use, as it is slow to import
+    global _cv2
+    if _cv2 is None:
+        try:
+            import cv2
+        except ImportError:
+            cv2 = False
+        _cv2 = cv2
+    return _cv2 or None
+
+
 def _get_contour_length(contour):
     contour_start = contour
     contour_end = np.r_[contour[1:], contour[0:1]]
     return np.linalg.norm(contour_end - contour_start, axis=1).sum()
 
 
-def compute_polygon_from_mask(mask):
+def _compute_polygon_skimage(mask, tolerance):
+    # contours are on the boundaries of pixels in the mask padded by 1
     contours = skimage.measure.find_contours(np.pad(mask, pad_width=1))
     if len(contours) == 0:
-        logger.warning("No contour found, so returning empty polygon.")
-        return np.empty((0, 2), dtype=np.float32)
+        return None
 
     contour = max(contours, key=_get_contour_length)
-    POLYGON_APPROX_TOLERANCE = 0.004
     polygon = skimage.measure.approximate_polygon(
         coords=contour,
-        tolerance=np.ptp(contour, axis=0).max() * POLYGON_APPROX_TOLERANCE,
+        tolerance=np.ptp(contour, axis=0).max() * tolerance,
     )
-    polygon = np.clip(polygon, (0, 0), (mask.shape[0] - 1, mask.shape[1] - 1))
     polygon = polygon[:-1]  # drop last point that is duplicate of first point
+    return polygon[:, ::-1] - 1  # yx -> xy, and remove the padding
 
-    if 0:
-        import PIL.Image
 
-        image_pil = PIL.Image.fromarray(imgviz.gray2rgb(imgviz.bool2ubyte(mask)))
-        imgviz.draw.line_(image_pil, yx=polygon, fill=(0, 255, 0))
-        for point in polygon:
-            imgviz.draw.circle_(image_pil, center=point, diameter=10, fill=(0, 255, 0))
-        imgviz.io.imsave("contour.jpg", np.asarray(image_pil))
+def _compute_polygon_opencv(cv2, mask, tolerance):
+    # contours are on the centers of pixels on the boundaries in the mask
+    contours, _ = cv2.findContours(
+        mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    if len(contours) == 0:
+        return None
+
+    contour = max(contours, key=lambda c: cv2.arcLength(c, True))
+    polygon = cv2.approxPolyDP(
+        contour,
+        epsilon=np.ptp(contour[:, 0], axis=0).max() * tolerance,
+        closed=True,
+    )
+    return polygon[:, 0].astype(np.float64)
+
+
+def _compute_polygon_from_mask(mask, config):
+    # contours are extracted only in the bounding box of the mask, which is
+    # often much smaller than the image
+    bbox = _get_bbox(mask)
+    if bbox is None:
+        return None
+    x1, y1, x2, y2 = bbox
+    mask = mask[y1:y2, x1:x2]
+
+    cv2 = None
+    if config["backend"] != "skimage":
+        cv2 = _get_cv2()
+        if cv2 is None and config["backend"] == "opencv":
+            logger.warning("opencv is not installed, so using skimage instead.")
+
+    if cv2 is None:
+        polygon = _compute_polygon_skimage(mask, tolerance=config["tolerance"])
+    else:
+        polygon = _compute_polygon_opencv(cv2, mask, tolerance=config["tolerance"])
+    if polygon is None:
+        return None
+    return polygon + (x1, y1)
+
+
+def compute_polygon_from_mask(mask):
+    # returns a read-only polygon (N, 2) of xy, which is shared by calls with
+    # the same mask, as masks are assumed not to be modified once computed.
+    # points on the boundaries of pixels can be out of the mask by 0.5
+    config = _polygon_config
+    mask_id = id(mask)
+    with _polygons_lock:
+        entry = _polygons.get(mask_id)
+    if entry is not None and entry[0]() is mask and entry[1] is config:
+        return entry[2]
+
+    polygon = _compute_polygon_from_mask(mask, config=config)
+    if polygon is None:
+        logger.warning("No contour found, so returning empty polygon.")
+        polygon = np.empty((0, 2), dtype=np.float32)
+    polygon.flags.writeable = False
+
+    def remove(_, mask_id=mask_id):
+        with _polygons_lock:
+            _polygons.pop(mask_id, None)
 
-    return polygon[:, ::-1]  # yx -> xy
+    try:
+        ref = weakref.ref(mask, remove)
+    except TypeError:
+        return polygon
+    with _polygons_lock:
+        _polygons[mask_id] = (ref, config, polygon)
+    return polygon
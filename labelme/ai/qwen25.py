@@ -1,52 +1,264 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+import gc
+import queue
+import threading
 
+from ..logger import logger
 
-def generate_response(prompt: str, model_name="Qwen/Qwen2.5-1.5B-Instruct"):
-    """
-    生成基于提示的文本回复
-    :param prompt: 用户输入的提示文本
-    :param model_name: 使用的预训练模型名称，默认使用 "Qwen/Qwen2.5-3B-Instruct"
-    :return: 生成的文本回复
-    """
-    # 加载模型
-    model = AutoModelForCausalLM.from_pretrained(
-        model_name, torch_dtype="auto", device_map="auto"
-    )
+DEFAULT_MODEL_NAME = "Qwen/Qwen2.5-1.5B-Instruct"
+DEFAULT_IDLE_TIMEOUT = 300  # seconds until the model is unloaded when unused
+DEFAULT_BATCH_SIZE = 8
 
-    # 加载tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+DESCRIPTION_PROMPT = "影像中的{label} {description} ，请用30个字详细描述破损情况。"
 
-    try:
-        # 构建消息列表
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt},
-        ]
 
-        # 使用chat模板格式化消息
-        text = tokenizer.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
+class _Cancelled(Exception):
+    pass
+
+
+def format_description_prompt(label, description=""):
+    return DESCRIPTION_PROMPT.format(label=label, description=description or "")
+
+
+class DescriptionRequest(object):
+    def __init__(self, prompt, on_text=None, on_finished=None):
+        # a list of prompts is generated in a batch, and gives a list of texts
+        self.prompt = prompt
+        # called with the request and each new piece of text
+        self.on_text = on_text
+        # called with the request and the text, which is None if failed
+        self.on_finished = on_finished
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _call(self, callback, *args):
+        # errors of callbacks, e.g., emitting on a deleted QObject, must not
+        # stop the worker, which serves the other requests
+        try:
+            callback(self, *args)
+        except Exception:
+            logger.exception("Failed to call back description request")
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class DescriptionEngine(object):
+    # keeps a model loaded while used and generates texts of requests in order
+    # on a worker thread, which exits and unloads the model after idle_timeout
+
+    def __init__(
+        self,
+        model_name=DEFAULT_MODEL_NAME,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        max_new_tokens=100,
+    ):
+        self.model_name = model_name
+        self.idle_timeout = idle_timeout
+        self.max_new_tokens = max_new_tokens
+
+        self._model = None
+        self._tokenizer = None
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def submit(self, prompt, on_text=None, on_finished=None):
+        request = DescriptionRequest(
+            prompt=prompt, on_text=on_text, on_finished=on_finished
+        )
+        with self._lock:
+            self._queue.put(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+        return request
+
+    def generate(self, prompt):
+        result = []
+        finished = threading.Event()
+
+        def on_finished(request, text):
+            result.append(text)
+            finished.set()
+
+        self.submit(prompt, on_finished=on_finished)
+        finished.wait()
+        return result[0]
+
+    def generate_batch(self, prompts, batch_size=DEFAULT_BATCH_SIZE):
+        texts = []
+        for i in range(0, len(prompts), batch_size):
+            batch_texts = self.generate(list(prompts[i : i + batch_size]))
+            if batch_texts is None:
+                batch_texts = [None] * len(prompts[i : i + batch_size])
+            texts.extend(batch_texts)
+        return texts
+
+    def _worker(self):
+        try:
+            self._serve()
+        finally:
+            # a new worker is started by submit, even if this one failed
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _serve(self):
+        while True:
+            try:
+                request = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if not self._queue.empty():
+                        continue
+                    self._thread = None
+                    self._unload()
+                return
+
+            if request.cancelled:
+                continue
+            try:
+                text = self._generate(request)
+            except _Cancelled:
+                continue
+            except Exception:
+                logger.exception("Failed to generate description")
+                text = None
+            if request.on_finished and not request.cancelled:
+                request._call(request.on_finished, text)
+
+    def _load(self):
+        from transformers import AutoModelForCausalLM
+        from transformers import AutoTokenizer
+
+        logger.debug("Loading description model: %r", self.model_name)
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_name, torch_dtype="auto", device_map="auto"
         )
-        print(text)
+        # padded on the left to generate continuations of prompts in a batch
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name, padding_side="left")
+        return model, tokenizer
 
-        # tokenizer编码
-        model_inputs = tokenizer([text], return_tensors="pt").to(model.device)
+    def _unload(self):
+        if self._model is None:
+            return
+        logger.debug("Unloading description model: %r", self.model_name)
+        self._model = None
+        self._tokenizer = None
+        gc.collect()
+        try:
+            import torch
+        except ImportError:
+            return
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
 
-        # 生成文本
-        generated_ids = model.generate(**model_inputs, max_new_tokens=100)
+    def _generate(self, request):
+        if self._model is None:
+            self._model, self._tokenizer = self._load()
+        model, tokenizer = self._model, self._tokenizer
 
-        # 解码生成的文本
-        generated_ids = [
-            output_ids[len(input_ids) :]  # 跳过输入的token部分
-            for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)
+        prompts = request.prompt
+        if not isinstance(prompts, list):
+            prompts = [prompts]
+        texts = [
+            tokenizer.apply_chat_template(
+                [
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": prompt},
+                ],
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+            for prompt in prompts
         ]
+        model_inputs = tokenizer(texts, return_tensors="pt", padding=True).to(
+            model.device
+        )
+
+        pad_token_id = tokenizer.pad_token_id
+        if pad_token_id is None:
+            pad_token_id = tokenizer.eos_token_id
+        streamer = None
+        if len(prompts) == 1:
+            streamer = _create_streamer(tokenizer, request)
+        generated_ids = model.generate(
+            **model_inputs,
+            max_new_tokens=self.max_new_tokens,
+            pad_token_id=pad_token_id,
+            streamer=streamer,
+        )
+        # skip tokens of the prompts, which are padded to the same length
+        generated_ids = generated_ids[:, model_inputs.input_ids.shape[1] :]
+        responses = tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
+        if not isinstance(request.prompt, list):
+            return responses[0]
+        return responses
+
+
+def _create_streamer(tokenizer, request):
+    from transformers import TextStreamer
+
+    class Streamer(TextStreamer):
+        def put(self, value):
+            # generation stops by raising from the streamer, which is given
+            # each new token
+            if request.cancelled:
+                raise _Cancelled
+            super().put(value)
+
+        def on_finalized_text(self, text, stream_end=False):
+            if text and request.on_text and not request.cancelled:
+                request._call(request.on_text, text)
+
+    return Streamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_description_engine(model_name=DEFAULT_MODEL_NAME):
+    with _engines_lock:
+        if model_name not in _engines:
+            _engines[model_name] = DescriptionEngine(model_name=model_name)
+        return _engines[model_name]
+
+
+def generate_response(prompt: str, model_name=DEFAULT_MODEL_NAME):
+    """
+    生成基于提示的文本回复
+    :param prompt: 用户输入的提示文本
+    :param model_name: 使用的预训练模型名称，默认使用 "Qwen/Qwen2.5-1.5B-Instruct"
+    :return: 生成的文本回复
+    """
+    return get_description_engine(model_name).generate(prompt)
+
+
+def generate_responses(
+    prompts, model_name=DEFAULT_MODEL_NAME, batch_size=DEFAULT_BATCH_SIZE
+):
+    return get_description_engine(model_name).generate_batch(
+        prompts, batch_size=batch_size
+    )
+
 
-        # 返回生成的文本
-        response = tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
-        return response
-    finally:
-        # 显式释放内存
-        del model
-        del tokenizer
-        torch.cuda.empty_cache()  # 如果使用 GPU，清理缓存
+def generate_descriptions(
+    labels_and_descriptions,
+    model_name=DEFAULT_MODEL_NAME,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    # (label, description) -> generated description, or None if failed
+    prompts = [
+        format_description_prompt(label, description)
+        for label, description in labels_and_descriptions
+    ]
+    return generate_responses(prompts, model_name=model_name, batch_size=batch_size)
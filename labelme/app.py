@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import concurrent.futures
 import functools
 import html
 import math
@@ -9,8 +10,6 @@ import re
 import webbrowser
 
 import imgviz
-import natsort
-import numpy as np
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -19,9 +18,15 @@ from qtpy.QtCore import Qt
 from labelme import PY2
 from labelme import __appname__
 from labelme.ai import MODELS
+from labelme.ai import _embedding_cache
+from labelme.ai import _session
+from labelme.ai import _tiling
+from labelme.ai import _utils as ai_utils
 from labelme.config import get_config
 from labelme.label_file import LabelFile
 from labelme.label_file import LabelFileError
+from labelme.label_file import ShapeRecord
+from labelme.label_store import LabelStore
 from labelme.logger import logger
 from labelme.shape import Shape
 from labelme.widgets import BrightnessContrastDialog
@@ -51,6 +56,10 @@ LABEL_COLORMAP = imgviz.label_colormap()
 class MainWindow(QtWidgets.QMainWindow):
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = 0, 1, 2
 
+    # emitted from the save worker, so connected slots run on the GUI thread
+    labelFileSaved = QtCore.Signal(object, str)  # label file, image path
+    labelFileSaveFailed = QtCore.Signal(str, str)  # image path, error message
+
     def __init__(
         self,
         config=None,
@@ -69,6 +78,17 @@ class MainWindow(QtWidgets.QMainWindow):
             config = get_config()
         self._config = config
 
+        # options of onnxruntime sessions created by AI models
+        _session.configure(self._config["ai"]["onnxruntime"])
+        _tiling.configure(self._config["ai"]["tiling"])
+        _embedding_cache.configure(self._config["ai"]["embedding_cache"])
+        ai_utils.configure_polygon(self._config["ai"]["polygon"])
+
+        # label files are kept in a single database instead of JSON files
+        self._labelStore = None
+        if self._config["label_store"]:
+            self._labelStore = LabelStore(osp.expanduser(self._config["label_store"]))
+
         # set default shape colors
         Shape.line_color = QtGui.QColor(*self._config["shape"]["line_color"])
         Shape.fill_color = QtGui.QColor(*self._config["shape"]["fill_color"])
@@ -99,6 +119,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self._copied_shapes = None
 
+        # label files are serialized and written on a single worker thread
+        self._saveExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._saveFuture = None
+        self.labelFileSaved.connect(self._onLabelFileSaved)
+        self.labelFileSaveFailed.connect(self._onLabelFileSaveFailed)
+
         # Main widgets and related state.
         self.labelDialog = LabelDialog(
             parent=self,
@@ -174,6 +200,16 @@ class MainWindow(QtWidgets.QMainWindow):
             lambda pos: self.status(f"Mouse is at: x={pos.x()}, y={pos.y()}")
         )
 
+        # embeddings of the next images are computed while annotating the
+        # current one, and the generation is bumped to cancel stale requests.
+        # they are requested once the current image is set to the model, and
+        # wait for its embedding, so that the encoders do not run together
+        self._prefetchExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._prefetchGeneration = 0
+        self._prefetchPending = False
+        self._prefetchModel = None
+        self.canvas.aiImageSet.connect(self._onAiImageSet)
+
         scrollArea = QtWidgets.QScrollArea()
         scrollArea.setWidget(self.canvas)
         scrollArea.setWidgetResizable(True)
@@ -990,7 +1026,7 @@ class MainWindow(QtWidgets.QMainWindow):
             if self.output_dir:
                 label_file_without_path = osp.basename(label_file)
                 label_file = osp.join(self.output_dir, label_file_without_path)
-            self.saveLabels(label_file)
+            self.saveLabels(label_file, background=True)
             return
         self.dirty = True
         self.actions.save.setEnabled(True)
@@ -1357,14 +1393,17 @@ class MainWindow(QtWidgets.QMainWindow):
         s = []
         for shape in shapes:
             label = shape["label"]
-            points = shape["points"]
+            if isinstance(shape, ShapeRecord):
+                points = shape.points  # without converting the array to a list
+            else:
+                points = shape["points"]
             shape_type = shape["shape_type"]
             flags = shape["flags"]
             description = shape.get("description", "")
             group_id = shape["group_id"]
             other_data = shape["other_data"]
 
-            if not points:
+            if len(points) == 0:
                 # skip point-empty shape
                 continue
 
@@ -1375,8 +1414,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 description=description,
                 mask=shape["mask"],
             )
-            for x, y in points:
-                shape.addPoint(QtCore.QPointF(x, y))
+            shape.setPointsArray(points)
             shape.close()
 
             default_flags = {}
@@ -1458,26 +1496,26 @@ class MainWindow(QtWidgets.QMainWindow):
     #             self.tr("Error saving label data"), self.tr("<b>%s</b>") % e
     #         )
     #         return False
-    def saveLabels(self, filename):
+    def saveLabels(self, filename, background=False):
         lf = LabelFile()
 
         def format_shape(s):
+            # reuse the dict of the last save unless the shape has changed
+            if s.serialized is not None:
+                return s.serialized
             data = s.other_data.copy()
             data.update(
                 dict(
                     label=s.label.encode("utf-8") if PY2 else s.label,
-                    points=[(p.x(), p.y()) for p in s.points],
+                    points=s.pointsToList(),
                     group_id=s.group_id,
                     description=s.description,
                     shape_type=s.shape_type,
                     flags=s.flags,
-                    mask=(
-                        None
-                        if s.mask is None
-                        else utils.img_arr_to_b64(s.mask.astype(np.uint8))
-                    ),
+                    mask=s.mask,
                 )
             )
+            s.serialized = data
             return data
 
         shapes = [format_shape(item.shape()) for item in self.labelList]
@@ -1488,40 +1526,85 @@ class MainWindow(QtWidgets.QMainWindow):
             flag = item.checkState() == Qt.Checked
             flags[key] = flag
 
-        try:
-            # 检查 self.imagePath 和 filename 是否在同一个驱动器上
-            if osp.splitdrive(self.imagePath)[0] != osp.splitdrive(filename)[0]:
-                imagePath = self.imagePath  # 使用绝对路径
-            else:
-                imagePath = osp.relpath(
-                    self.imagePath, osp.dirname(filename)
-                )  # 使用相对路径
-
-            imageData = self.imageData if self._config["store_data"] else None
-            if osp.dirname(filename) and not osp.exists(osp.dirname(filename)):
-                os.makedirs(osp.dirname(filename))
-            lf.save(
-                filename=filename,
-                shapes=shapes,
-                imagePath=imagePath,
-                imageData=imageData,
-                imageHeight=self.image.height(),
-                imageWidth=self.image.width(),
-                otherData=self.otherData,
-                flags=flags,
+        # 检查 self.imagePath 和 filename 是否在同一个驱动器上
+        if osp.splitdrive(self.imagePath)[0] != osp.splitdrive(filename)[0]:
+            imagePath = self.imagePath  # 使用绝对路径
+        else:
+            imagePath = osp.relpath(
+                self.imagePath, osp.dirname(filename)
+            )  # 使用相对路径
+
+        imageData = self.imageData if self._config["store_data"] else None
+        if (
+            self._labelStore is None
+            and osp.dirname(filename)
+            and not osp.exists(osp.dirname(filename))
+        ):
+            os.makedirs(osp.dirname(filename))
+        save = functools.partial(
+            lf.save,
+            filename=filename,
+            shapes=shapes,
+            imagePath=imagePath,
+            imageData=imageData,
+            imageHeight=self.image.height(),
+            imageWidth=self.image.width(),
+            otherData=self.otherData,
+            flags=flags,
+            data_file=self._config["data_file"] and self._labelStore is None,
+            mask_codec=self._config["mask_codec"],
+            store=self._labelStore,
+        )
+
+        if background:
+            self._saveFuture = self._saveExecutor.submit(
+                self._saveLabelFileWorker, lf, save, self.imagePath
             )
-            self.labelFile = lf
-            items = self.fileListWidget.findItems(self.imagePath, Qt.MatchExactly)
-            if len(items) > 0:
-                if len(items) != 1:
-                    raise RuntimeError("There are duplicate files.")
-                items[0].setCheckState(Qt.Checked)
             return True
+
+        self._waitForPendingSave()
+        try:
+            save()
         except LabelFileError as e:
             self.errorMessage(
                 self.tr("Error saving label data"), self.tr("<b>%s</b>") % e
             )
             return False
+        self._onLabelFileSaved(lf, self.imagePath)
+        return True
+
+    def _saveLabelFileWorker(self, lf, save, imagePath):
+        try:
+            save()
+        except Exception as e:
+            self.labelFileSaveFailed.emit(imagePath, str(e))
+            return
+        self.labelFileSaved.emit(lf, imagePath)
+
+    def _waitForPendingSave(self):
+        if self._saveFuture is not None:
+            self._saveFuture.result()
+            self._saveFuture = None
+
+    def _onLabelFileSaved(self, labelFile, imagePath):
+        if not self._labelFileExists(labelFile.filename):
+            return  # deleted after saved in the background
+        if imagePath == self.imagePath:
+            self.labelFile = labelFile
+        items = self.fileListWidget.findItems(imagePath, Qt.MatchExactly)
+        if len(items) > 0:
+            if len(items) != 1:
+                raise RuntimeError("There are duplicate files.")
+            items[0].setCheckState(Qt.Checked)
+
+    def _onLabelFileSaveFailed(self, imagePath, message):
+        if imagePath == self.imagePath:
+            # keep the changes so that they can be saved again
+            self.dirty = True
+            self.actions.save.setEnabled(True)
+        self.errorMessage(
+            self.tr("Error saving label data"), self.tr("<b>%s</b>") % message
+        )
 
     def duplicateSelectedShape(self):
         added_shapes = self.canvas.duplicateSelectedShapes()
@@ -1702,6 +1785,8 @@ class MainWindow(QtWidgets.QMainWindow):
             self.fileListWidget.repaint()
             return
 
+        # the label file may be being written by an auto save
+        self._waitForPendingSave()
         self.resetState()
         self.canvas.setEnabled(False)
         if filename is None:
@@ -1719,9 +1804,9 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.output_dir:
             label_file_without_path = osp.basename(label_file)
             label_file = osp.join(self.output_dir, label_file_without_path)
-        if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
+        if self._labelFileExists(label_file):
             try:
-                self.labelFile = LabelFile(label_file)
+                self.labelFile = LabelFile(label_file, store=self._labelStore)
             except LabelFileError as e:
                 self.errorMessage(
                     self.tr("Error opening file"),
@@ -1819,8 +1904,54 @@ class MainWindow(QtWidgets.QMainWindow):
         self.toggleActions(True)
         self.canvas.setFocus()
         self.status(str(self.tr("Loaded %s")) % osp.basename(str(filename)))
+        self._prefetchGeneration += 1  # cancel queued prefetches
+        self._prefetchPending = True
         return True
 
+    def _onAiImageSet(self):
+        if self._prefetchPending or self.canvas.aiModel is not self._prefetchModel:
+            self._prefetchAiEmbeddings()
+
+    def _prefetchAiEmbeddings(self):
+        self._prefetchGeneration += 1
+        self._prefetchPending = False
+        model = self.canvas.aiModel
+        self._prefetchModel = model
+        n_prefetch = self._config["ai"]["prefetch"]
+        if model is None or not n_prefetch or not hasattr(model, "prefetch"):
+            return
+        imageList = self.imageList
+        if self.filename not in imageList:
+            return
+        index = imageList.index(self.filename)
+        for filename in imageList[index + 1 : index + 1 + n_prefetch]:
+            self._prefetchExecutor.submit(
+                self._prefetchAiEmbedding, model, filename, self._prefetchGeneration
+            )
+
+    def _prefetchAiEmbedding(self, model, filename, generation):
+        if generation != self._prefetchGeneration:
+            return  # cancelled by opening another image
+        model.wait_image_embedding()
+        if generation != self._prefetchGeneration:
+            return
+        label_file = osp.splitext(filename)[0] + ".json"
+        if self.output_dir:
+            label_file = osp.join(self.output_dir, osp.basename(label_file))
+        try:
+            if self._labelFileExists(label_file):
+                imageData = LabelFile(
+                    label_file, lazy=True, store=self._labelStore
+                ).imageData
+            else:
+                imageData = LabelFile.load_image_file(filename)
+            image = utils.imageDataToPixmapArray(imageData)
+            if image is None or generation != self._prefetchGeneration:
+                return
+            model.prefetch(image=image)
+        except Exception as e:
+            logger.warning("Failed to prefetch embedding of %r: %s", filename, e)
+
     def resizeEvent(self, event):
         if (
             self.canvas
@@ -1877,6 +2008,8 @@ class MainWindow(QtWidgets.QMainWindow):
             event.ignore()
         else:
             print("closeEvent: mayContinue() is True")
+        self._waitForPendingSave()
+        self._prefetchGeneration += 1  # cancel queued prefetches
         self.settings.setValue("filename", self.filename if self.filename else "")
         self.settings.setValue("window/size", self.size())
         self.settings.setValue("window/position", self.pos())
@@ -2136,13 +2269,18 @@ class MainWindow(QtWidgets.QMainWindow):
         if answer != mb.Yes:
             return
 
+        # the label file may be being written by an auto save
+        self._waitForPendingSave()
         label_file = self.getLabelFile()
         if label_file is None:
             logger.warning("getLabelFile未返回标签文件路径。")
 
             return
-        if osp.exists(label_file):
-            os.remove(label_file)
+        if self._labelFileExists(label_file):
+            if self._labelStore is not None:
+                self._labelStore.delete(label_file)
+            else:
+                os.remove(label_file)
             logger.info("标签文件已被删除：{}".format(label_file))
 
             item = self.fileListWidget.currentItem()
@@ -2169,7 +2307,12 @@ class MainWindow(QtWidgets.QMainWindow):
             return False
 
         label_file = self.getLabelFile()
-        return osp.exists(label_file)
+        return self._labelFileExists(label_file)
+
+    def _labelFileExists(self, label_file):
+        if self._labelStore is not None:
+            return label_file in self._labelStore
+        return QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file)
 
     def mayContinue(self):
         if not self.dirty:
@@ -2306,7 +2449,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 label_file = osp.join(self.output_dir, label_file_without_path)
             item = QtWidgets.QListWidgetItem(file)
             item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
+            if self._labelFileExists(label_file):
                 item.setCheckState(Qt.Checked)
             else:
                 item.setCheckState(Qt.Unchecked)
@@ -2338,6 +2481,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 filenames = [f for f in filenames if re.search(pattern, f)]
             except re.error:
                 pass
+        if self._labelStore is not None:
+            # one query instead of one per image
+            storedKeys = set(self._labelStore.keys())
         for filename in filenames:
             label_file = osp.splitext(filename)[0] + ".json"
             if self.output_dir:
@@ -2345,7 +2491,11 @@ class MainWindow(QtWidgets.QMainWindow):
                 label_file = osp.join(self.output_dir, label_file_without_path)
             item = QtWidgets.QListWidgetItem(filename)
             item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            if QtCore.QFile.exists(label_file) and LabelFile.is_label_file(label_file):
+            if self._labelStore is not None:
+                hasLabelFile = self._labelStore.key(label_file) in storedKeys
+            else:
+                hasLabelFile = self._labelFileExists(label_file)
+            if hasLabelFile:
                 item.setCheckState(Qt.Checked)
             else:
                 item.setCheckState(Qt.Unchecked)
@@ -2353,16 +2503,4 @@ class MainWindow(QtWidgets.QMainWindow):
         self.openNextImg(load=load)
 
     def scanAllImages(self, folderPath):
-        extensions = [
-            ".%s" % fmt.data().decode().lower()
-            for fmt in QtGui.QImageReader.supportedImageFormats()
-        ]
-
-        images = []
-        for root, dirs, files in os.walk(folderPath):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relativePath = os.path.normpath(osp.join(root, file))
-                    images.append(relativePath)
-        images = natsort.os_sorted(images)
-        return images
+        return utils.scanAllImages(folderPath)
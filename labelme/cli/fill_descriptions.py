@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import json
+import os.path as osp
+
+from labelme import label_file
+from labelme.ai import qwen25
+from labelme.logger import logger
+
+
+def _load_shapes_to_fill(filename, overwrite=False):
+    with open(filename, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return data, []
+    indices = [
+        i
+        for i, shape in enumerate(data.get("shapes", []))
+        if overwrite or not shape.get("description")
+    ]
+    return data, indices
+
+
+def fill_descriptions(
+    filenames,
+    model_name=qwen25.DEFAULT_MODEL_NAME,
+    batch_size=qwen25.DEFAULT_BATCH_SIZE,
+    overwrite=False,
+):
+    # shapes of several files are generated together to fill batches, and each
+    # file is saved once all of its shapes are generated
+    engine = qwen25.get_description_engine(model_name)
+
+    queued = []  # [(entry, index of shape)]
+    num_filled = 0
+
+    def flush(final=False):
+        nonlocal num_filled
+        while len(queued) >= batch_size or (final and queued):
+            batch = queued[:batch_size]
+            del queued[:batch_size]
+            prompts = [
+                qwen25.format_description_prompt(
+                    entry["data"]["shapes"][i]["label"],
+                    entry["data"]["shapes"][i].get("description"),
+                )
+                for entry, i in batch
+            ]
+            texts = engine.generate_batch(prompts, batch_size=batch_size)
+            for (entry, i), text in zip(batch, texts):
+                if text is not None:
+                    entry["data"]["shapes"][i]["description"] = text.strip()
+                    num_filled += 1
+                entry["num_queued"] -= 1
+                if entry["num_queued"] == 0:
+                    label_file._write_file_atomic(
+                        entry["filename"], label_file._dumps_json(entry["data"])
+                    )
+                    logger.info("Saved descriptions: {}".format(entry["filename"]))
+
+    for filename in filenames:
+        try:
+            data, indices = _load_shapes_to_fill(filename, overwrite=overwrite)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to load {}: {}".format(filename, e))
+            continue
+        if not indices:
+            continue
+        entry = dict(filename=filename, data=data, num_queued=len(indices))
+        queued.extend((entry, i) for i in indices)
+        flush()
+    flush(final=True)
+    return num_filled
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill missing descriptions of shapes in labelme JSON files "
+        "with texts generated by the Qwen model."
+    )
+    parser.add_argument("json_dir", help="directory of labelme JSON files")
+    parser.add_argument(
+        "--model",
+        default=qwen25.DEFAULT_MODEL_NAME,
+        help="model name of transformers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=qwen25.DEFAULT_BATCH_SIZE,
+        help="number of shapes generated at once (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-new-tokens",
+        type=int,
+        default=100,
+        help="max number of generated tokens per shape (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="regenerate descriptions that are not empty",
+    )
+    args = parser.parse_args()
+
+    filenames = sorted(
+        glob.glob(osp.join(args.json_dir, "**", "*.json"), recursive=True)
+    )
+    logger.info("Filling descriptions in {} files".format(len(filenames)))
+
+    qwen25.get_description_engine(args.model).max_new_tokens = args.max_new_tokens
+    num_filled = fill_descriptions(
+        filenames,
+        model_name=args.model,
+        batch_size=args.batch_size,
+        overwrite=args.overwrite,
+    )
+    logger.info("Filled {} descriptions".format(num_filled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+import argparse
+import concurrent.futures
+import os.path as osp
+import threading
+
+from labelme import utils
+from labelme.ai import MODELS
+from labelme.ai import _embedding_cache
+from labelme.ai import _session
+from labelme.ai import _tiling
+from labelme.config import get_config
+from labelme.label_file import LabelFile
+from labelme.logger import logger
+
+
+def _load_image(filename, output_dir=None):
+    # the same image as loaded by labelme, which may be embedded in label file
+    label_file = osp.splitext(filename)[0] + LabelFile.suffix
+    if output_dir:
+        label_file = osp.join(output_dir, osp.basename(label_file))
+    if osp.exists(label_file):
+        imageData = LabelFile(label_file, lazy=True).imageData
+    else:
+        imageData = LabelFile.load_image_file(filename)
+    if imageData is None:
+        return None
+    return utils.imageDataToPixmapArray(imageData)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute image embeddings of AI models in advance, "
+        "so that annotating with AI models does not wait for the encoder."
+    )
+    parser.add_argument("image_dir", help="image directory opened with labelme")
+    parser.add_argument(
+        "--model",
+        default=get_config()["ai"]["default"],
+        choices=[model.name for model in MODELS],
+        help="AI model (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        "-O",
+        "-o",
+        help="output directory of label files given to labelme, if any",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="embedding cache directory (default: ai.embedding_cache.dir in the "
+        "config, or {})".format(_embedding_cache.DEFAULT_CACHE_DIR),
+    )
+    parser.add_argument(
+        "--max-size",
+        type=float,
+        help="max size of the embedding cache in GiB "
+        "(default: ai.embedding_cache.max_size in the config)",
+    )
+    default_config_file = osp.join(osp.expanduser("~"), ".labelmerc")
+    parser.add_argument(
+        "--config",
+        default=default_config_file,
+        help="config file or yaml-format string for options of AI models "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of images encoded in parallel by separate sessions of the "
+        "model, among which ai.onnxruntime.intra_op_num_threads in the config "
+        "should divide the cores (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    config = get_config(args.config)
+    _session.configure(config["ai"]["onnxruntime"])
+    # embeddings of tiled images are computed on annotation, as tiles are
+    # selected by prompts
+    _tiling.configure(config["ai"]["tiling"])
+    # the same cache as labelme with the config, so that it reads the results
+    embedding_cache_config = dict(config["ai"]["embedding_cache"])
+    if args.cache_dir is not None:
+        embedding_cache_config["dir"] = args.cache_dir
+    if args.max_size is not None:
+        embedding_cache_config["max_size"] = args.max_size
+    _embedding_cache.configure(embedding_cache_config)
+    model_class = [model for model in MODELS if model.name == args.model][0]
+    # a model for each worker, as a model encodes one image at a time
+    local = threading.local()
+
+    filenames = utils.scanAllImages(args.image_dir)
+    logger.info("Computing embeddings of {} images".format(len(filenames)))
+
+    def precompute(filename):
+        image = _load_image(filename, output_dir=args.output)
+        if image is None:
+            logger.warning("Skipping invalid image: {}".format(filename))
+            return
+        if not hasattr(local, "model"):
+            local.model = model_class()
+        local.model.prefetch(image=image)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(precompute, filename) for filename in filenames]
+        for i, (filename, future) in enumerate(zip(filenames, futures)):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    "Failed to compute embedding of {}: {}".format(filename, e)
+                )
+                continue
+            logger.info("[{}/{}] {}".format(i + 1, len(filenames), filename))
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,25 @@ def validate_config_item(key, value):
         raise ValueError(
             "Unexpected value for config key 'shape_color': {}".format(value)
         )
+    if key == "mask_codec" and value not in ["png", "rle", "rle_uncompressed"]:
+        raise ValueError(
+            "Unexpected value for config key 'mask_codec': {}".format(value)
+        )
+    if key == "execution_mode" and value not in ["sequential", "parallel"]:
+        raise ValueError(
+            "Unexpected value for config key 'execution_mode': {}".format(value)
+        )
+    if key == "graph_optimization_level" and value not in [
+        "disable",
+        "basic",
+        "extended",
+        "all",
+    ]:
+        raise ValueError(
+            "Unexpected value for config key 'graph_optimization_level': {}".format(
+                value
+            )
+        )
     if key == "labels" and value is not None and len(value) != len(set(value)):
         raise ValueError(
             "Duplicates are detected for config key 'labels': {}".format(value)
@@ -1,9 +1,19 @@
 import base64
+import collections
+import collections.abc
 import contextlib
+import hashlib
 import io
 import json
+import mmap
+import multiprocessing
+import os
 import os.path as osp
+import shutil
+import tempfile
+import threading
 
+import numpy as np
 import PIL.Image
 
 from labelme import PY2
@@ -14,6 +24,20 @@ from labelme.logger import logger
 
 PIL.Image.MAX_IMAGE_PIXELS = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# read once at import, as os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 @contextlib.contextmanager
 def open(name, mode):
@@ -27,31 +51,212 @@ def open(name, mode):
     return
 
 
+@contextlib.contextmanager
+def _open_data_file(filename):
+    if filename is None:
+        yield None
+        return
+    with io.open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # empty files cannot be memory-mapped
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            yield m
+
+
+def _dumps_json(data):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass  # e.g., numpy scalars, so fall back to json
+    if ujson is not None:
+        try:
+            return ujson.dumps(
+                data, ensure_ascii=False, indent=2, escape_forward_slashes=False
+            ).encode("utf-8")
+        except (TypeError, OverflowError):
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _write_file_atomic(filename, data):
+    # write to a temporary file in the same directory and rename it over the
+    # target, so that the target is never left truncated
+    dirname = osp.dirname(osp.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(
+        prefix="." + osp.basename(filename) + ".", suffix=".tmp", dir=dirname
+    )
+    try:
+        with io.open(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if osp.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        else:
+            os.chmod(tmp_filename, 0o666 & ~_UMASK)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if osp.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+
+class _IdentityCache(object):
+    # caches values computed from objects that are not modified in place,
+    # e.g., imageData and masks, so that they are not re-encoded on each save
+    def __init__(self, maxsize):
+        self._maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, obj, key, func):
+        cache_key = (id(obj), key)
+        with self._lock:
+            if cache_key in self._cache:
+                # the object is kept alive by the cache, so its id is unique
+                cached_obj, value = self._cache[cache_key]
+                if cached_obj is obj:
+                    self._cache.move_to_end(cache_key)
+                    return value
+        value = func()
+        with self._lock:
+            self._cache[cache_key] = (obj, value)
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+        return value
+
+
 class LabelFileError(Exception):
     pass
 
 
+class ShapeRecord(collections.abc.Mapping):
+    # a shape in a label file, which can also be accessed like a dict of JSON
+    # values, where points are a list as in the file and the array is kept in
+    # the attribute
+    __slots__ = (
+        "label",
+        "points",
+        "shape_type",
+        "flags",
+        "description",
+        "group_id",
+        "mask",
+        "other_data",
+    )
+
+    def __init__(
+        self,
+        label,
+        points,
+        shape_type="polygon",
+        flags=None,
+        description=None,
+        group_id=None,
+        mask=None,
+        other_data=None,
+    ):
+        self.label = label
+        # (N, 2) array of (x, y)
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        self.shape_type = shape_type
+        self.flags = {} if flags is None else flags
+        self.description = description
+        self.group_id = group_id
+        self.mask = mask
+        self.other_data = {} if other_data is None else other_data
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == "points":
+            return utils.points_to_list(self.points)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == "points":
+            value = np.asarray(value, dtype=np.float32).reshape(-1, 2)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return "ShapeRecord(label={!r}, shape_type={!r}, n_points={})".format(
+            self.label, self.shape_type, len(self.points)
+        )
+
+
 class LabelFile(object):
     suffix = ".json"
+    data_file_suffix = ".bin"
+    mask_codecs = ["png", "rle", "rle_uncompressed"]
+
+    _image_data_b64_cache = _IdentityCache(maxsize=1)
+    _mask_cache = _IdentityCache(maxsize=128)
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, lazy=False, store=None):
         self.shapes = []
         self.imagePath = None
         self.imageData = None
+        self.imageHeight = None
+        self.imageWidth = None
         if filename is not None:
-            self.load(filename)
+            self.load(filename, lazy=lazy, store=store)
         self.filename = filename
 
+    @property
+    def imageData(self):
+        # in lazy mode, image bytes are decoded on first access
+        if self._imageDataLoader is not None:
+            loader = self._imageDataLoader
+            self._imageDataLoader = None
+            self._imageData = loader()
+        return self._imageData
+
+    @imageData.setter
+    def imageData(self, value):
+        self._imageDataLoader = None
+        self._imageData = value
+        self._image_array = None
+
+    @property
+    def image_array(self):
+        if self._image_array is None:
+            imageData = self.imageData
+            if imageData is not None:
+                self._image_array = utils.img_data_to_arr(imageData)
+        return self._image_array
+
     @staticmethod
     def load_image_file(filename):
         try:
-            image_pil = PIL.Image.open(filename)
+            with io.open(filename, "rb") as f:
+                imageData = f.read()
+            image_pil = PIL.Image.open(io.BytesIO(imageData))
         except IOError:
             logger.error("Failed opening image file: {}".format(filename))
             return
 
         # apply orientation to image according to exif
-        image_pil = utils.apply_exif_orientation(image_pil)
+        image_pil_oriented = utils.apply_exif_orientation(image_pil)
+
+        # pass through the original bytes when they can be shown as they are
+        if image_pil_oriented is image_pil:
+            if PY2 and QT4:
+                passthrough_formats = ["PNG"]
+            else:
+                passthrough_formats = ["JPEG", "PNG"]
+            if image_pil.format in passthrough_formats:
+                return imageData
 
         with io.BytesIO() as f:
             ext = osp.splitext(filename)[1].lower()
@@ -61,11 +266,109 @@ class LabelFile(object):
                 format = "JPEG"
             else:
                 format = "PNG"
-            image_pil.save(f, format=format)
+            image_pil_oriented.save(f, format=format)
             f.seek(0)
             return f.read()
 
-    def load(self, filename):
+    @staticmethod
+    def _encode_mask(mask, mask_codec="png", data_file=None):
+        if not isinstance(mask, np.ndarray):
+            # already encoded
+            return mask
+        if data_file is None:
+            if mask_codec == "rle":
+                return LabelFile._mask_cache.get(
+                    mask, mask_codec, lambda: utils.mask_to_rle(mask, compress=True)
+                )
+            if mask_codec == "rle_uncompressed":
+                return LabelFile._mask_cache.get(
+                    mask, mask_codec, lambda: utils.mask_to_rle(mask, compress=False)
+                )
+            return LabelFile._mask_cache.get(
+                mask, mask_codec, lambda: utils.img_arr_to_b64(mask.astype(np.uint8))
+            )
+        chunk = LabelFile._mask_cache.get(
+            mask,
+            "packbits",
+            lambda: np.packbits(mask.astype(bool), axis=None).tobytes(),
+        )
+        ref = dict(offset=data_file.tell(), length=len(chunk), size=list(mask.shape))
+        data_file.write(chunk)
+        return ref
+
+    @staticmethod
+    def _format_shape(shape, mask_codec="png", data_file=None):
+        shape = dict(shape)
+        if isinstance(shape["points"], np.ndarray):
+            shape["points"] = utils.points_to_list(shape["points"])
+        if shape.get("mask") is not None:
+            shape["mask"] = LabelFile._encode_mask(
+                shape["mask"], mask_codec=mask_codec, data_file=data_file
+            )
+        return shape
+
+    @staticmethod
+    def _decode_mask(mask, data_file=None):
+        if not mask:
+            return None
+        if isinstance(mask, dict) and "counts" in mask:
+            return utils.rle_to_mask(mask)
+        if isinstance(mask, dict):
+            height, width = mask["size"]
+            chunk = data_file[mask["offset"] : mask["offset"] + mask["length"]]
+            bits = np.unpackbits(np.frombuffer(chunk, dtype=np.uint8))
+            return bits[: height * width].reshape(height, width).astype(bool)
+        return utils.img_b64_to_arr(mask).astype(bool)
+
+    def _load_image_data(
+        self,
+        filename,
+        imageData_b64,
+        imagePath,
+        imageHeight,
+        imageWidth,
+        imageDataRef=None,
+        dataFile=None,
+    ):
+        if imageDataRef is not None:
+            offset, length = imageDataRef["offset"], imageDataRef["length"]
+            with _open_data_file(dataFile) as f:
+                imageData = f[offset : offset + length]
+        elif imageData_b64 is not None:
+            imageData = base64.b64decode(imageData_b64)
+            if PY2 and QT4:
+                imageData = utils.img_data_to_png_data(imageData)
+        else:
+            # relative path from label file to relative path from cwd
+            # normalized as the directory may not exist for a label store
+            imagePath = osp.normpath(osp.join(osp.dirname(filename), imagePath))
+            imageData = self.load_image_file(imagePath)
+        imageHeight, imageWidth = self._check_image_height_and_width(
+            imageData, imageHeight, imageWidth
+        )
+        return imageData, imageHeight, imageWidth
+
+    def _lazy_image_data_loader(
+        self, filename, imageData_b64, imagePath, imageDataRef, dataFile
+    ):
+        def loader():
+            try:
+                imageData, self.imageHeight, self.imageWidth = self._load_image_data(
+                    filename,
+                    imageData_b64,
+                    imagePath,
+                    self.imageHeight,
+                    self.imageWidth,
+                    imageDataRef=imageDataRef,
+                    dataFile=dataFile,
+                )
+            except Exception as e:
+                raise LabelFileError(e)
+            return imageData
+
+        return loader
+
+    def load(self, filename, lazy=False, store=None):
         keys = [
             "version",
             "imageData",
@@ -74,6 +377,8 @@ class LabelFile(object):
             "flags",  # image level flags
             "imageHeight",
             "imageWidth",
+            "dataFile",  # binary file with imageData and masks
+            "imageDataRef",
         ]
         shape_keys = [
             "label",
@@ -85,39 +390,48 @@ class LabelFile(object):
             "mask",
         ]
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-
-            if data["imageData"] is not None:
-                imageData = base64.b64decode(data["imageData"])
-                if PY2 and QT4:
-                    imageData = utils.img_data_to_png_data(imageData)
+            if store is not None:
+                data = json.loads(store.get(filename).decode("utf-8"))
             else:
-                # relative path from label file to relative path from cwd
-                imagePath = osp.join(osp.dirname(filename), data["imagePath"])
-                imageData = self.load_image_file(imagePath)
+                with open(filename, "r") as f:
+                    data = json.load(f)
+
             flags = data.get("flags") or {}
             imagePath = data["imagePath"]
-            self._check_image_height_and_width(
-                base64.b64encode(imageData).decode("utf-8"),
-                data.get("imageHeight"),
-                data.get("imageWidth"),
-            )
-            shapes = [
-                dict(
-                    label=s["label"],
-                    points=s["points"],
-                    shape_type=s.get("shape_type", "polygon"),
-                    flags=s.get("flags", {}),
-                    description=s.get("description"),
-                    group_id=s.get("group_id"),
-                    mask=utils.img_b64_to_arr(s["mask"]).astype(bool)
-                    if s.get("mask")
-                    else None,
-                    other_data={k: v for k, v in s.items() if k not in shape_keys},
+            imageHeight = data.get("imageHeight")
+            imageWidth = data.get("imageWidth")
+            imageDataRef = data.get("imageDataRef")
+            dataFile = data.get("dataFile")
+            if dataFile is not None:
+                dataFile = osp.join(osp.dirname(filename), dataFile)
+            if lazy:
+                imageData = self._lazy_image_data_loader(
+                    filename, data["imageData"], imagePath, imageDataRef, dataFile
                 )
-                for s in data["shapes"]
-            ]
+            else:
+                imageData, imageHeight, imageWidth = self._load_image_data(
+                    filename,
+                    data["imageData"],
+                    imagePath,
+                    imageHeight,
+                    imageWidth,
+                    imageDataRef=imageDataRef,
+                    dataFile=dataFile,
+                )
+            with _open_data_file(dataFile) as f:
+                shapes = [
+                    ShapeRecord(
+                        label=s["label"],
+                        points=s["points"],
+                        shape_type=s.get("shape_type", "polygon"),
+                        flags=s.get("flags", {}),
+                        description=s.get("description"),
+                        group_id=s.get("group_id"),
+                        mask=self._decode_mask(s.get("mask"), data_file=f),
+                        other_data={k: v for k, v in s.items() if k not in shape_keys},
+                    )
+                    for s in data["shapes"]
+                ]
         except Exception as e:
             raise LabelFileError(e)
 
@@ -130,25 +444,31 @@ class LabelFile(object):
         self.flags = flags
         self.shapes = shapes
         self.imagePath = imagePath
-        self.imageData = imageData
+        self.imageHeight = imageHeight
+        self.imageWidth = imageWidth
+        if lazy:
+            self.imageData = None
+            self._imageDataLoader = imageData
+        else:
+            self.imageData = imageData
         self.filename = filename
         self.otherData = otherData
 
     @staticmethod
     def _check_image_height_and_width(imageData, imageHeight, imageWidth):
-        img_arr = utils.img_b64_to_arr(imageData)
-        if imageHeight is not None and img_arr.shape[0] != imageHeight:
+        height, width = utils.img_data_to_shape(imageData)
+        if imageHeight is not None and height != imageHeight:
             logger.error(
                 "imageHeight does not match with imageData or imagePath, "
                 "so getting imageHeight from actual image."
             )
-            imageHeight = img_arr.shape[0]
-        if imageWidth is not None and img_arr.shape[1] != imageWidth:
+            imageHeight = height
+        if imageWidth is not None and width != imageWidth:
             logger.error(
                 "imageWidth does not match with imageData or imagePath, "
                 "so getting imageWidth from actual image."
             )
-            imageWidth = img_arr.shape[1]
+            imageWidth = width
         return imageHeight, imageWidth
 
     def save(
@@ -161,12 +481,36 @@ class LabelFile(object):
         imageData=None,
         otherData=None,
         flags=None,
+        data_file=False,
+        mask_codec="png",
+        store=None,
     ):
+        if mask_codec not in self.mask_codecs:
+            raise ValueError("Unsupported mask_codec: {}".format(mask_codec))
+        if data_file and store is not None:
+            raise ValueError("data_file is not supported with store")
+        # with data_file=True, imageData and masks are written to a binary file
+        # next to the JSON and referenced by offset instead of base64-embedded
+        data_file_buffer = io.BytesIO() if data_file else None
+        imageDataRef = None
         if imageData is not None:
-            imageData = base64.b64encode(imageData).decode("utf-8")
             imageHeight, imageWidth = self._check_image_height_and_width(
                 imageData, imageHeight, imageWidth
             )
+            if data_file:
+                imageDataRef = dict(offset=0, length=len(imageData))
+                data_file_buffer.write(imageData)
+                imageData = None
+            else:
+                imageData = self._image_data_b64_cache.get(
+                    imageData,
+                    None,
+                    lambda: base64.b64encode(imageData).decode("utf-8"),
+                )
+        shapes = [
+            self._format_shape(shape, mask_codec=mask_codec, data_file=data_file_buffer)
+            for shape in shapes
+        ]
         if otherData is None:
             otherData = {}
         if flags is None:
@@ -180,16 +524,199 @@ class LabelFile(object):
             imageHeight=imageHeight,
             imageWidth=imageWidth,
         )
+        if data_file:
+            # named by the content, so that the data file of the previous JSON
+            # is kept until the new JSON replaces it
+            dataFile = "{}.{}{}".format(
+                osp.splitext(filename)[0],
+                hashlib.sha1(data_file_buffer.getbuffer()).hexdigest()[:16],
+                self.data_file_suffix,
+            )
+            data["dataFile"] = osp.basename(dataFile)
+            if imageDataRef is not None:
+                data["imageDataRef"] = imageDataRef
         for key, value in otherData.items():
             assert key not in data
             data[key] = value
         try:
-            with open(filename, "w") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if store is not None:
+                store.put(filename, _dumps_json(data))
+            else:
+                if data_file:
+                    oldDataFile = self._get_data_file(filename)
+                    _write_file_atomic(dataFile, data_file_buffer.getbuffer())
+                _write_file_atomic(filename, _dumps_json(data))
+                if data_file and oldDataFile not in [None, dataFile]:
+                    try:
+                        os.remove(oldDataFile)
+                    except OSError as e:
+                        logger.warning(
+                            "Failed to remove data file {}: {}".format(oldDataFile, e)
+                        )
             self.filename = filename
         except Exception as e:
             raise LabelFileError(e)
 
+    @staticmethod
+    def _get_data_file(filename):
+        # data file referenced by an existing label file, if any
+        try:
+            with io.open(filename, "r", encoding="utf-8") as f:
+                dataFile = _LabelFileScanner(f).scan(["dataFile"]).get("dataFile")
+        except (OSError, ValueError):
+            return None
+        if not dataFile:
+            return None
+        return osp.join(osp.dirname(filename), dataFile)
+
     @staticmethod
     def is_label_file(filename):
         return osp.splitext(filename)[1].lower() == LabelFile.suffix
+
+
+class _LabelFileScanner(object):
+    # incremental parser of the top-level object of a label file, which reads
+    # the file in chunks and skips string values without decoding them, so
+    # that the base64 imageData is never held in memory as a whole
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, f):
+        self._f = f
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size):
+        # drop the consumed part of the buffer before extending it
+        self._buf = self._buf[self._pos :]
+        self._pos = 0
+        chunk = self._f.read(size)
+        if not chunk:
+            self._eof = True
+        self._buf += chunk
+        return bool(chunk)
+
+    def _peek(self):
+        while True:
+            buf = self._buf
+            pos = self._pos
+            n = len(buf)
+            while pos < n and buf[pos] in " \t\n\r":
+                pos += 1
+            self._pos = pos
+            if pos < n:
+                return buf[pos]
+            if not self._read(self.chunk_size):
+                raise ValueError("Unexpected end of file")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(
+                "Expected {!r} at {!r}".format(char, self._buf[self._pos :][:20])
+            )
+        self._pos += 1
+
+    def _decode(self):
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+                end = None
+            # a value ending at the end of the buffer may be truncated
+            if end is not None and (end < len(self._buf) or self._eof):
+                self._pos = end
+                return value
+            self._read(size)
+            size *= 2
+
+    def _count_backslashes(self, end):
+        i = end
+        while i > 0 and self._buf[i - 1] == "\\":
+            i -= 1
+        return end - i
+
+    def _skip_string(self):
+        self._expect('"')
+        start = self._pos
+        while True:
+            end = self._buf.find('"', start)
+            if end == -1:
+                # keep trailing backslashes, which may escape the next quote
+                n_backslashes = self._count_backslashes(len(self._buf))
+                self._pos = len(self._buf) - n_backslashes
+                if not self._read(self.chunk_size):
+                    raise ValueError("Unterminated string")
+                start = n_backslashes
+                continue
+            if self._count_backslashes(end) % 2 == 0:
+                self._pos = end + 1
+                return
+            start = end + 1
+
+    def scan(self, keys):
+        # returns values of the keys in the top-level object
+        data = {}
+        self._expect("{")
+        if self._peek() == "}":
+            return data
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if key in keys:
+                data[key] = self._decode()
+            elif self._peek() == '"':
+                self._skip_string()
+            else:
+                self._decode()
+            if self._peek() == "}":
+                return data
+            self._expect(",")
+
+
+def scan_label_file(filename):
+    """Read shapes of a label file without decoding imageData.
+
+    Returns (filename, shapes, flags, imageHeight, imageWidth), where shapes
+    are dicts as stored in the file.
+    """
+    try:
+        with io.open(filename, "r", encoding="utf-8") as f:
+            data = _LabelFileScanner(f).scan(
+                ["shapes", "flags", "imageHeight", "imageWidth"]
+            )
+    except Exception as e:
+        raise LabelFileError(e)
+    return (
+        filename,
+        data.get("shapes", []),
+        data.get("flags") or {},
+        data.get("imageHeight"),
+        data.get("imageWidth"),
+    )
+
+
+def scan_label_files(filenames, processes=None, chunksize=16):
+    """Scan label files in parallel processes, see scan_label_file.
+
+    filenames can also be a directory, which is searched recursively.
+    """
+    if isinstance(filenames, str):
+        dirpath = filenames
+        filenames = []
+        for root, dirs, files in os.walk(dirpath):
+            for file in sorted(files):
+                if LabelFile.is_label_file(file):
+                    filenames.append(osp.join(root, file))
+    if processes == 1:
+        for filename in filenames:
+            yield scan_label_file(filename)
+        return
+    with multiprocessing.Pool(processes=processes) as pool:
+        for result in pool.imap(scan_label_file, filenames, chunksize=chunksize):
+            yield result
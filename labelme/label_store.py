@@ -0,0 +1,138 @@
+import contextlib
+import io
+import json
+import os
+import os.path as osp
+import sqlite3
+import threading
+
+from labelme.label_file import LabelFile
+from labelme.label_file import _write_file_atomic
+from labelme.logger import logger
+
+
+class LabelStore(object):
+    """Label files of a project stored in a single SQLite database.
+
+    Label files are keyed by the path they would have in the per-image JSON
+    layout, relative to the directory of the database, so
+    ``LabelFile(filename, store=store)`` reads the same label file as
+    ``LabelFile(filename)`` would after ``store.export_json_dir(root)``.
+    """
+
+    suffix = ".db"
+
+    def __init__(self, filename, root=None):
+        self.filename = filename
+        if root is None:
+            root = osp.dirname(osp.abspath(filename))
+        self.root = root
+        self._depth = 0
+        self._lock = threading.RLock()
+        # saves are done on a worker thread of MainWindow
+        self._conn = sqlite3.connect(
+            filename, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL)"
+        )
+
+    def key(self, filename):
+        key = osp.relpath(osp.abspath(filename), self.root)
+        return key.replace(os.sep, "/")
+
+    def filename_from_key(self, key):
+        return osp.join(self.root, *key.split("/"))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # writes in the block are committed at once, which is much faster
+        # than a commit per label file
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def __contains__(self, filename):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM labels WHERE key = ?", (self.key(filename),)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def keys(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM labels").fetchall()
+        return [key for (key,) in rows]
+
+    def get(self, filename):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM labels WHERE key = ?", (self.key(filename),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(filename)
+        return bytes(row[0])
+
+    def put(self, filename, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO labels (key, data) VALUES (?, ?)",
+                (self.key(filename), sqlite3.Binary(data)),
+            )
+
+    def delete(self, filename):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM labels WHERE key = ?", (self.key(filename),)
+            )
+
+    def import_json_dir(self, dirpath):
+        n_imported = 0
+        with self.transaction():
+            for root, dirs, files in os.walk(dirpath):
+                for file in files:
+                    if not LabelFile.is_label_file(file):
+                        continue
+                    json_file = osp.join(root, file)
+                    with io.open(json_file, "rb") as f:
+                        data = f.read()
+                    # the binary data file is not stored
+                    if b'"dataFile"' in data and json.loads(data).get("dataFile"):
+                        logger.warning(
+                            "Skipping label file with data file: {}".format(json_file)
+                        )
+                        continue
+                    filename = osp.join(self.root, osp.relpath(json_file, dirpath))
+                    self.put(filename, data)
+                    n_imported += 1
+        return n_imported
+
+    def export_json_dir(self, dirpath):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data FROM labels").fetchall()
+        for key, data in rows:
+            json_file = osp.join(dirpath, *key.split("/"))
+            if not osp.exists(osp.dirname(json_file)):
+                os.makedirs(osp.dirname(json_file))
+            _write_file_atomic(json_file, data)
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
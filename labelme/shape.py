@@ -37,6 +37,20 @@ class Shape(object):
     point_size = 8
     scale = 1.0
 
+    # attributes saved to label files, changing which invalidates serialized
+    _serialized_attrs = frozenset(
+        [
+            "label",
+            "points",
+            "shape_type",
+            "flags",
+            "description",
+            "group_id",
+            "mask",
+            "other_data",
+        ]
+    )
+
     def __init__(
         self,
         label=None,
@@ -47,8 +61,11 @@ class Shape(object):
         description=None,
         mask=None,
     ):
+        # cache of the dict saved to label files, reset when the shape changes
+        self.serialized = None
         self.label = label
         self.group_id = group_id
+        self._points_array = None
         self.points = []
         self.point_labels = []
         self.shape_type = shape_type
@@ -77,6 +94,46 @@ class Shape(object):
             # is used for drawing the pending line a different color.
             self.line_color = line_color
 
+    def __setattr__(self, name, value):
+        if name in self._serialized_attrs:
+            object.__setattr__(self, "serialized", None)
+        object.__setattr__(self, name, value)
+
+    @property
+    def points(self):
+        # points set as an array are converted to QPointF on first access,
+        # which is usually when the shape is painted
+        if self._points_array is not None:
+            self._points = [
+                QtCore.QPointF(x, y)
+                for x, y in labelme.utils.points_to_list(self._points_array)
+            ]
+            self._points_array = None
+        return self._points
+
+    @points.setter
+    def points(self, value):
+        self._points_array = None
+        self._points = value
+
+    def setPointsArray(self, points):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) > 1:
+            # skip points equal to the first one as addPoint does
+            keep = np.any(points != points[0], axis=1)
+            keep[0] = True
+            points = points[keep]
+        self._points_array = points
+        self._points = None
+        self.point_labels = [1] * len(points)
+        self.serialized = None
+
+    def pointsToList(self):
+        # [[x, y], ...] for saving, without converting points set as an array
+        if self._points_array is not None:
+            return labelme.utils.points_to_list(self._points_array)
+        return [[p.x(), p.y()] for p in self._points]
+
     def setShapeRefined(self, shape_type, points, point_labels, mask=None):
         self._shape_raw = (self.shape_type, self.points, self.point_labels)
         self.shape_type = shape_type
@@ -120,12 +177,14 @@ class Shape(object):
         else:
             self.points.append(point)
             self.point_labels.append(label)
+            self.serialized = None
 
     def canAddPoint(self):
         return self.shape_type in ["polygon", "linestrip"]
 
     def popPoint(self):
         if self.points:
+            self.serialized = None
             if self.point_labels:
                 self.point_labels.pop()
             return self.points.pop()
@@ -134,6 +193,7 @@ class Shape(object):
     def insertPoint(self, i, point, label=1):
         self.points.insert(i, point)
         self.point_labels.insert(i, label)
+        self.serialized = None
 
     def removePoint(self, i):
         if not self.canAddPoint():
@@ -161,6 +221,7 @@ class Shape(object):
 
         self.points.pop(i)
         self.point_labels.pop(i)
+        self.serialized = None
 
     def isClosed(self):
         return self._closed
@@ -191,7 +252,7 @@ class Shape(object):
                 else self.fill_color.getRgb()
             )
             image_to_draw[self.mask] = fill_color
-            qimage = QtGui.QImage.fromData(labelme.utils.img_arr_to_data(image_to_draw))
+            qimage = labelme.utils.img_arr_to_qt(image_to_draw)
             painter.drawImage(
                 int(round(self.points[0].x())),
                 int(round(self.points[0].y())),
@@ -354,6 +415,7 @@ class Shape(object):
 
     def moveVertexBy(self, i, offset):
         self.points[i] = self.points[i] + offset
+        self.serialized = None
 
     def highlightVertex(self, i, action):
         """Highlight a vertex appropriately based on the current action
@@ -374,6 +436,8 @@ class Shape(object):
         return copy.deepcopy(self)
 
     def __len__(self):
+        if self._points_array is not None:
+            return len(self._points_array)
         return len(self.points)
 
     def __getitem__(self, key):
@@ -381,3 +445,4 @@ class Shape(object):
 
     def __setitem__(self, key, value):
         self.points[key] = value
+        self.serialized = None
@@ -14,15 +14,20 @@ from ._io import lblsave
 from .image import apply_exif_orientation
 from .image import img_arr_to_b64
 from .image import img_arr_to_data
+from .image import img_arr_to_qt
 from .image import img_b64_to_arr
 from .image import img_data_to_arr
 from .image import img_data_to_pil
 from .image import img_data_to_png_data
+from .image import img_data_to_shape
 from .image import img_pil_to_data
 from .image import img_qt_to_arr
+from .image import mask_to_rle
+from .image import rle_to_mask
 
 from .shape import labelme_shapes_to_label
 from .shape import masks_to_bboxes
+from .shape import points_to_list
 from .shape import polygons_to_mask
 from .shape import shape_to_mask
 from .shape import shapes_to_label
@@ -36,5 +41,7 @@ from .qt import struct
 from .qt import distance
 from .qt import distancetoline
 from .qt import fmtShortcut
+from .qt import scanAllImages
+from .qt import imageDataToPixmapArray
 
 from . import rs
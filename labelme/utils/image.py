@@ -23,6 +23,13 @@ def img_data_to_arr(img_data):
     return img_arr
 
 
+def img_data_to_shape(img_data):
+    # PIL.Image.open only parses the header, so pixels are never decoded
+    with io.BytesIO(img_data) as f:
+        width, height = PIL.Image.open(f).size
+    return height, width
+
+
 def img_b64_to_arr(img_b64):
     img_data = base64.b64decode(img_b64)
     img_arr = img_data_to_arr(img_data)
@@ -48,6 +55,68 @@ def img_arr_to_data(img_arr):
     return img_data
 
 
+def mask_to_rle(mask, compress=True):
+    # COCO-style run-length encoding in column-major order, starting with 0s
+    flat = np.asarray(mask, dtype=bool).ravel(order="F")
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate([[0], changes, [flat.size]]))
+    if flat.size and flat[0]:
+        counts = np.concatenate([[0], counts])
+    counts = counts.tolist()
+    if compress:
+        counts = _rle_counts_to_string(counts)
+    return dict(size=list(mask.shape[:2]), counts=counts)
+
+
+def rle_to_mask(rle):
+    height, width = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, str):
+        counts = _rle_string_to_counts(counts)
+    values = np.arange(len(counts)) % 2 == 1
+    mask = np.repeat(values, counts)
+    return mask.reshape((height, width), order="F")
+
+
+def _rle_counts_to_string(counts):
+    # same as rleToString in pycocotools
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def _rle_string_to_counts(string):
+    # same as rleFrString in pycocotools
+    counts = []
+    p = 0
+    while p < len(string):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(string[p]) - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
 def img_data_to_png_data(img_data):
     with io.BytesIO() as f:
         f.write(img_data)
@@ -59,11 +128,65 @@ def img_data_to_png_data(img_data):
             return f.read()
 
 
+class _QImageBuffer(object):
+    # base of arrays viewing the buffer of a QImage, which keeps it alive
+    def __init__(self, img_qt, shape, strides):
+        bits = img_qt.constBits()  # not detaching the implicitly shared data
+        if hasattr(bits, "setsize"):  # sip.voidptr of PyQt
+            bits.setsize(img_qt.bytesPerLine() * img_qt.height())
+        buffer = np.frombuffer(bits, dtype=np.uint8)
+        self._img_qt = img_qt
+        self.__array_interface__ = {
+            "version": 3,
+            "shape": shape,
+            "strides": strides,
+            "typestr": "|u1",
+            "data": (buffer.__array_interface__["data"][0], True),
+        }
+
+
 def img_qt_to_arr(img_qt):
-    w, h, d = img_qt.size().width(), img_qt.size().height(), img_qt.depth()
-    bytes_ = img_qt.bits().asstring(w * h * d // 8)
-    img_arr = np.frombuffer(bytes_, dtype=np.uint8).reshape((h, w, d // 8))
-    return img_arr
+    # read-only view of the pixels in the byte order of the format without
+    # copying, e.g., (H, W, 4) of BGRA for Format_ARGB32 on little endian
+    if img_qt.depth() % 8 != 0 or img_qt.format() == img_qt.Format_Indexed8:
+        img_qt = img_qt.convertToFormat(
+            img_qt.Format_ARGB32 if img_qt.hasAlphaChannel() else img_qt.Format_RGB32
+        )
+    w, h, d = img_qt.width(), img_qt.height(), img_qt.depth() // 8
+    if w == 0 or h == 0:
+        return np.zeros((h, w, d), dtype=np.uint8)
+    # rows are aligned to 4 bytes, so there can be padding at their end
+    return np.asarray(
+        _QImageBuffer(img_qt, shape=(h, w, d), strides=(img_qt.bytesPerLine(), d, 1))
+    )
+
+
+def img_arr_to_qt(img_arr):
+    # QImage viewing the buffer of a uint8 array of (H, W), (H, W, 3) as RGB or
+    # (H, W, 4) as RGBA without copying if it is contiguous. copies of the
+    # QImage made in Qt (not QPixmap.fromImage) must not outlive the wrapper
+    from qtpy import QtGui
+
+    if img_arr.dtype != np.uint8:
+        raise ValueError("Unsupported dtype: {}".format(img_arr.dtype))
+    if img_arr.ndim == 2:
+        format = QtGui.QImage.Format_Grayscale8
+    elif img_arr.ndim == 3 and img_arr.shape[2] == 3:
+        format = QtGui.QImage.Format_RGB888
+    elif img_arr.ndim == 3 and img_arr.shape[2] == 4:
+        format = QtGui.QImage.Format_RGBA8888
+    else:
+        raise ValueError("Unsupported shape: {}".format(img_arr.shape))
+    img_arr = np.ascontiguousarray(img_arr)  # no copy if already contiguous
+    img_qt = QtGui.QImage(
+        img_arr.data,
+        img_arr.shape[1],
+        img_arr.shape[0],
+        img_arr.strides[0],
+        format,
+    )
+    img_qt._img_arr = img_arr  # keeps the buffer alive with the wrapper
+    return img_qt
 
 
 def apply_exif_orientation(image):
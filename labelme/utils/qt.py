@@ -1,11 +1,15 @@
+import os
 import os.path as osp
 from math import sqrt
 
+import natsort
 import numpy as np
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
 
+from .image import img_qt_to_arr
+
 here = osp.dirname(osp.abspath(__file__))
 
 
@@ -96,3 +100,32 @@ def distancetoline(point, line):
 def fmtShortcut(text):
     mod, key = text.split("+", 1)
     return "<b>%s</b>+<b>%s</b>" % (mod, key)
+
+
+def scanAllImages(folderPath):
+    extensions = [
+        ".%s" % fmt.data().decode().lower()
+        for fmt in QtGui.QImageReader.supportedImageFormats()
+    ]
+
+    images = []
+    for root, dirs, files in os.walk(folderPath):
+        for file in files:
+            if file.lower().endswith(tuple(extensions)):
+                relativePath = os.path.normpath(osp.join(root, file))
+                images.append(relativePath)
+    images = natsort.os_sorted(images)
+    return images
+
+
+def imageDataToPixmapArray(imageData):
+    # the same array as img_qt_to_arr(pixmap.toImage()) for the pixmap shown in
+    # Canvas, but without QPixmap, which is only usable in the GUI thread
+    image = QtGui.QImage.fromData(imageData)
+    if image.isNull():
+        return None
+    if image.hasAlphaChannel():
+        image = image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+    else:
+        image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+    return img_qt_to_arr(image)
@@ -18,6 +18,15 @@ def polygons_to_mask(img_shape, polygons, shape_type=None):
     return shape_to_mask(img_shape, points=polygons, shape_type=shape_type)
 
 
+def points_to_list(points):
+    points = np.asarray(points)
+    if points.dtype == np.float32:
+        # format with the shortest repr of float32, e.g., 0.1 instead of
+        # 0.10000000149011612
+        points = points.astype(str).astype(np.float64)
+    return points.tolist()
+
+
 def shape_to_mask(img_shape, points, shape_type=None, line_width=10, point_size=5):
     mask = np.zeros(img_shape[:2], dtype=np.uint8)
     mask = PIL.Image.fromarray(mask)
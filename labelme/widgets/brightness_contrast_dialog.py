@@ -1,8 +1,10 @@
+import numpy as np
 import PIL.Image
 import PIL.ImageEnhance
 from qtpy import QtWidgets
 from qtpy.QtCore import Qt
-from qtpy.QtGui import QImage
+
+import labelme.utils
 
 
 class BrightnessContrastDialog(QtWidgets.QDialog):
@@ -61,7 +63,7 @@ class BrightnessContrastDialog(QtWidgets.QDialog):
         if contrast != 1:
             img = PIL.ImageEnhance.Contrast(img).enhance(contrast)
 
-        qimage = QImage(
-            img.tobytes(), img.width, img.height, img.width * 3, QImage.Format_RGB888
-        )
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        qimage = labelme.utils.img_arr_to_qt(np.asarray(img))
         self.callback(qimage)
@@ -1,4 +1,8 @@
+import collections
+import threading
+
 import imgviz
+import numpy as np
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -6,6 +10,7 @@ from qtpy import QtWidgets
 import labelme.ai
 import labelme.utils
 from labelme import QT5
+from labelme.ai import _tiling
 from labelme.logger import logger
 from labelme.shape import Shape
 
@@ -21,6 +26,12 @@ CURSOR_GRAB = QtCore.Qt.OpenHandCursor
 
 MOVE_SPEED = 5.0
 
+# AI models are given the visible region of the image expanded by this ratio of
+# its size on each side, and the region is updated only when the view leaves it
+# or is zoomed in by more than AI_REGION_ZOOM_HYSTERESIS
+AI_REGION_MARGIN = 0.5
+AI_REGION_ZOOM_HYSTERESIS = 1.5
+
 
 class Canvas(QtWidgets.QWidget):
     zoomRequest = QtCore.Signal(int, QtCore.QPoint)
@@ -31,6 +42,9 @@ class Canvas(QtWidgets.QWidget):
     drawingPolygon = QtCore.Signal(bool)
     vertexSelected = QtCore.Signal(bool)
     mouseMoved = QtCore.Signal(QtCore.QPointF)
+    aiModelInitialized = QtCore.Signal()
+    aiImageSet = QtCore.Signal()
+    aiPreviewReady = QtCore.Signal(object, object)  # key, result
 
     CREATE, EDIT = 0, 1
 
@@ -103,6 +117,29 @@ class Canvas(QtWidgets.QWidget):
         self.setFocusPolicy(QtCore.Qt.WheelFocus)
 
         self._ai_model = None
+        # whole pixmap as an array, converted once per pixmap so that its
+        # cache key is computed once
+        self._pixmapArray = None
+        # region (x1, y1, x2, y2) of the pixmap given to AI models, and its
+        # image as an array, which is downsized when the canvas is zoomed out
+        self._ai_region = None
+        self._ai_image = None
+        self._ai_image_model = None  # model given the image
+        # regions are updated out of paintEvent, as set_image hashes the image
+        self._aiRegionTimer = QtCore.QTimer(self)
+        self._aiRegionTimer.setSingleShot(True)
+        self._aiRegionTimer.timeout.connect(self._onAiRegionTimeout)
+        self._aiRegionPoints = ()
+        # AI previews are predicted on a worker thread, which takes only the
+        # latest request, so that painting never waits for the decoder
+        self._aiPreviewCondition = threading.Condition()
+        self._aiPreviewRequest = None
+        self._aiPreviewRequestedKey = None
+        self._aiPreviewThread = None
+        self._aiPreviewGeneration = 0
+        self._aiPreviewResults = collections.OrderedDict()
+        self._aiPreviewLatest = None
+        self.aiPreviewReady.connect(self._onAiPreviewReady)
 
     def fillDrawing(self):
         return self._fill_drawing
@@ -144,10 +181,164 @@ class Canvas(QtWidgets.QWidget):
             logger.warning("Pixmap is not set yet")
             return
 
-        self._ai_model.set_image(
-            image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
+        self._updateAiRegion(force=True)
+        self.aiModelInitialized.emit()
+
+    @property
+    def aiModel(self):
+        return self._ai_model
+
+    def _clearAiPreviews(self):
+        self._aiPreviewGeneration += 1
+        self._aiPreviewRequestedKey = None
+        self._aiPreviewResults.clear()
+        self._aiPreviewLatest = None
+
+    def _requestAiPreview(self, key):
+        if key == self._aiPreviewRequestedKey:
+            return  # being predicted
+        self._aiPreviewRequestedKey = key
+        with self._aiPreviewCondition:
+            self._aiPreviewRequest = (key, self._ai_model, self._getAiImageTransform())
+            self._aiPreviewCondition.notify()
+        if self._aiPreviewThread is None:
+            self._aiPreviewThread = threading.Thread(
+                target=self._aiPreviewWorker, daemon=True
+            )
+            self._aiPreviewThread.start()
+
+    def _aiPreviewWorker(self):
+        while True:
+            with self._aiPreviewCondition:
+                while self._aiPreviewRequest is None:
+                    self._aiPreviewCondition.wait()
+                key, model, transform = self._aiPreviewRequest
+                self._aiPreviewRequest = None
+            _, createMode, points, point_labels = key
+            try:
+                result = _predictAiShape(
+                    model, transform, createMode, points, point_labels
+                )
+            except Exception as e:
+                logger.warning("Failed to predict AI preview: %s", e)
+                continue
+            self.aiPreviewReady.emit(key, result)
+
+    def _onAiPreviewReady(self, key, result):
+        if key[0] != self._aiPreviewGeneration:
+            return  # for a previous image or model
+        self._aiPreviewResults[key] = result
+        while len(self._aiPreviewResults) > 32:
+            self._aiPreviewResults.popitem(last=False)
+        self._aiPreviewLatest = (key, result)
+        self.update()
+
+    def _getVisibleImageRect(self):
+        rect = self.visibleRegion().boundingRect()
+        if rect.isEmpty():
+            return None
+        p1 = self.transformPos(QtCore.QPointF(rect.topLeft()))
+        p2 = self.transformPos(QtCore.QPointF(rect.right() + 1, rect.bottom() + 1))
+        x1, y1 = max(0, p1.x()), max(0, p1.y())
+        x2, y2 = min(self.pixmap.width(), p2.x()), min(self.pixmap.height(), p2.y())
+        if x1 >= x2 or y1 >= y2:
+            return None
+        return x1, y1, x2, y2
+
+    def _computeAiRegion(self, points=()):
+        width, height = self.pixmap.width(), self.pixmap.height()
+        if self.scale >= 1 and _tiling.is_tiled((height, width)):
+            # the whole image, which is encoded in tiles at its resolution,
+            # whereas a region smaller than it would be downsized as a whole
+            return 0, 0, width, height
+        visible = self._getVisibleImageRect()
+        if visible is None:
+            return 0, 0, width, height
+        x1, y1, x2, y2 = visible
+        margin_x = (x2 - x1) * AI_REGION_MARGIN
+        margin_y = (y2 - y1) * AI_REGION_MARGIN
+        xs = [x1 - margin_x, x2 + margin_x] + [x for x, _ in points]
+        ys = [y1 - margin_y, y2 + margin_y] + [y for _, y in points]
+        return (
+            max(0, int(min(xs))),
+            max(0, int(min(ys))),
+            min(width, int(max(xs)) + 1),
+            min(height, int(max(ys)) + 1),
         )
 
+    def _isAiRegionValid(self, points=()):
+        if self._ai_region is None or self._ai_image_model is not self._ai_model:
+            return False
+        x1, y1, x2, y2 = self._ai_region
+        for x, y in points:
+            if not (x1 <= x < x2 and y1 <= y < y2):
+                return False
+        visible = self._getVisibleImageRect()
+        if visible is None:
+            return True
+        vx1, vy1, vx2, vy2 = visible
+        if vx1 < x1 or vy1 < y1 or vx2 > x2 or vy2 > y2:
+            return False  # moved out of the region
+        max_size = (1 + 2 * AI_REGION_MARGIN) * AI_REGION_ZOOM_HYSTERESIS
+        if x2 - x1 > (vx2 - vx1) * max_size or y2 - y1 > (vy2 - vy1) * max_size:
+            return False  # zoomed in
+        image_scale = self._ai_image.shape[1] / (x2 - x1)
+        if min(1, self.scale) > image_scale * AI_REGION_ZOOM_HYSTERESIS:
+            return False  # zoomed in beyond the resolution of the image
+        return True
+
+    def _updateAiRegion(self, points=(), force=False):
+        # recomputes the embedding only when the view moves beyond the region,
+        # so that panning and zooming slightly keep the current embedding
+        if self._ai_model is None or self.pixmap is None:
+            return
+        if not force and self._isAiRegionValid(points):
+            return
+        region = self._computeAiRegion(points)
+        if region != self._ai_region or self._ai_image is None:
+            self._ai_region = region
+            self._ai_image = self._getAiImage(region)
+        elif self._ai_image_model is self._ai_model:
+            return
+        self._ai_image_model = self._ai_model
+        self._ai_model.set_image(image=self._ai_image)
+        self._clearAiPreviews()
+        self.update()
+        self.aiImageSet.emit()
+
+    def _scheduleAiRegionUpdate(self, points=()):
+        self._aiRegionPoints = points
+        self._aiRegionTimer.start(0)
+
+    def _onAiRegionTimeout(self):
+        self._updateAiRegion(self._aiRegionPoints)
+
+    def _getPixmapArray(self):
+        if self._pixmapArray is None:
+            self._pixmapArray = labelme.utils.img_qt_to_arr(self.pixmap.toImage())
+        return self._pixmapArray
+
+    def _getAiImage(self, region):
+        x1, y1, x2, y2 = region
+        if (x1, y1, x2, y2) == (0, 0, self.pixmap.width(), self.pixmap.height()):
+            # the whole pixmap at its resolution, as embeddings are prefetched
+            return self._getPixmapArray()
+        pixmap = self.pixmap.copy(QtCore.QRect(x1, y1, x2 - x1, y2 - y1))
+        if self.scale < 1:
+            pixmap = pixmap.scaled(
+                max(1, int(round(pixmap.width() * self.scale))),
+                max(1, int(round(pixmap.height() * self.scale))),
+                QtCore.Qt.IgnoreAspectRatio,
+                QtCore.Qt.SmoothTransformation,
+            )
+        return labelme.utils.img_qt_to_arr(pixmap.toImage())
+
+    def _getAiImageTransform(self):
+        # (x1, y1, scale_x, scale_y) to map image coordinates to the AI image
+        x1, y1, x2, y2 = self._ai_region
+        height, width = self._ai_image.shape[:2]
+        return x1, y1, width / (x2 - x1), height / (y2 - y1)
+
     def storeShapes(self):
         shapesBackup = []
         for shape in self.shapes:
@@ -748,44 +939,42 @@ class Canvas(QtWidgets.QWidget):
             drawing_shape.addPoint(self.line[1])
             drawing_shape.fill = True
             drawing_shape.paint(p)
-        elif self.createMode == "ai_polygon" and self.current is not None:
+        elif self.createMode in ["ai_polygon", "ai_mask"] and self.current is not None:
             drawing_shape = self.current.copy()
             drawing_shape.addPoint(
                 point=self.line.points[1],
                 label=self.line.point_labels[1],
             )
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
+            points = tuple((point.x(), point.y()) for point in drawing_shape.points)
+            key = (
+                self._aiPreviewGeneration,
+                self.createMode,
+                points,
+                tuple(drawing_shape.point_labels),
             )
-            if len(points) > 2:
-                drawing_shape.setShapeRefined(
-                    shape_type="polygon",
-                    points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                    point_labels=[1] * len(points),
-                )
-                drawing_shape.fill = self.fillDrawing()
+            result = self._aiPreviewResults.get(key)
+            if result is None:
+                if self._isAiRegionValid(points):
+                    self._requestAiPreview(key)
+                else:
+                    # requested once the region is updated
+                    self._scheduleAiRegionUpdate(points)
+                # show the latest preview until the result arrives
+                if (
+                    self._aiPreviewLatest is not None
+                    and self._aiPreviewLatest[0][1] == self.createMode
+                ):
+                    result = self._aiPreviewLatest[1]
+            if self.createMode == "ai_polygon":
+                if result is not None and len(result) > 2:
+                    _refineAiShape(drawing_shape, self.createMode, result)
+                    drawing_shape.fill = self.fillDrawing()
+                    drawing_shape.selected = True
+                    drawing_shape.paint(p)
+            elif result is not None:
+                _refineAiShape(drawing_shape, self.createMode, result)
                 drawing_shape.selected = True
                 drawing_shape.paint(p)
-        elif self.createMode == "ai_mask" and self.current is not None:
-            drawing_shape = self.current.copy()
-            drawing_shape.addPoint(
-                point=self.line.points[1],
-                label=self.line.point_labels[1],
-            )
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in drawing_shape.points],
-                point_labels=drawing_shape.point_labels,
-            )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
-            drawing_shape.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
-            )
-            drawing_shape.selected = True
-            drawing_shape.paint(p)
 
         p.end()
 
@@ -816,32 +1005,20 @@ class Canvas(QtWidgets.QWidget):
 
     def finalise(self):
         assert self.current
-        if self.createMode == "ai_polygon":
-            # convert points to polygon by an AI model
+        if self.createMode in ["ai_polygon", "ai_mask"]:
+            # convert points to polygon or mask by an AI model
             assert self.current.shape_type == "points"
-            points = self._ai_model.predict_polygon_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            self.current.setShapeRefined(
-                points=[QtCore.QPointF(point[0], point[1]) for point in points],
-                point_labels=[1] * len(points),
-                shape_type="polygon",
-            )
-        elif self.createMode == "ai_mask":
-            # convert points to mask by an AI model
-            assert self.current.shape_type == "points"
-            mask = self._ai_model.predict_mask_from_points(
-                points=[[point.x(), point.y()] for point in self.current.points],
-                point_labels=self.current.point_labels,
-            )
-            y1, x1, y2, x2 = imgviz.instances.masks_to_bboxes([mask])[0].astype(int)
-            self.current.setShapeRefined(
-                shape_type="mask",
-                points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
-                point_labels=[1, 1],
-                mask=mask[y1 : y2 + 1, x1 : x2 + 1],
+            points = [(point.x(), point.y()) for point in self.current.points]
+            self._updateAiRegion(points)
+            result = _predictAiShape(
+                self._ai_model,
+                self._getAiImageTransform(),
+                self.createMode,
+                points,
+                self.current.point_labels,
             )
+            _refineAiShape(self.current, self.createMode, result)
+            self._aiPreviewLatest = None
         self.current.close()
 
         self.shapes.append(self.current)
@@ -1030,10 +1207,13 @@ class Canvas(QtWidgets.QWidget):
 
     def loadPixmap(self, pixmap, clear_shapes=True):
         self.pixmap = pixmap
+        self._pixmapArray = None
+        self._ai_region = None
+        self._ai_image = None
+        self._clearAiPreviews()
         if self._ai_model:
-            self._ai_model.set_image(
-                image=labelme.utils.img_qt_to_arr(self.pixmap.toImage())
-            )
+            # after the view of the pixmap is updated by the caller
+            self._scheduleAiRegionUpdate()
         if clear_shapes:
             self.shapes = []
         self.update()
@@ -1065,5 +1245,58 @@ class Canvas(QtWidgets.QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = None
+        self._pixmapArray = None
+        self._ai_region = None
+        self._ai_image = None
+        self._aiRegionTimer.stop()
+        self._clearAiPreviews()
         self.shapesBackups = []
         self.update()
+
+
+def _predictAiShape(model, transform, createMode, points, point_labels):
+    # points are mapped to the image given to the model by transform, and the
+    # result is mapped back
+    x1, y1, scale_x, scale_y = transform
+    points = [[(x - x1) * scale_x, (y - y1) * scale_y] for x, y in points]
+    point_labels = list(point_labels)
+    if createMode == "ai_polygon":
+        polygon = model.predict_polygon_from_points(
+            points=points, point_labels=point_labels
+        )
+        return polygon / (scale_x, scale_y) + (x1, y1)
+    (xmin, ymin, _, _), mask = model.predict_mask_from_points(
+        points=points, point_labels=point_labels
+    )
+    if mask.size == 0:
+        xmin, ymin, mask = 0, 0, np.zeros((1, 1), dtype=bool)
+    if (scale_x, scale_y) != (1, 1):
+        mask = imgviz.resize(
+            mask.astype(np.uint8),
+            height=max(1, int(round(mask.shape[0] / scale_y))),
+            width=max(1, int(round(mask.shape[1] / scale_x))),
+            interpolation="nearest",
+        ).astype(bool)
+    xmin = int(round(xmin / scale_x)) + x1
+    ymin = int(round(ymin / scale_y)) + y1
+    return (
+        (xmin, ymin, xmin + mask.shape[1] - 1, ymin + mask.shape[0] - 1),
+        mask,
+    )
+
+
+def _refineAiShape(shape, createMode, result):
+    if createMode == "ai_polygon":
+        shape.setShapeRefined(
+            shape_type="polygon",
+            points=[QtCore.QPointF(point[0], point[1]) for point in result],
+            point_labels=[1] * len(result),
+        )
+    else:
+        (x1, y1, x2, y2), mask = result
+        shape.setShapeRefined(
+            shape_type="mask",
+            points=[QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2)],
+            point_labels=[1, 1],
+            mask=mask,
+        )
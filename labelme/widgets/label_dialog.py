@@ -7,7 +7,6 @@ from qtpy import QtWidgets
 
 
 import labelme.utils
-from labelme.ai.qwen25 import generate_response
 from labelme.logger import logger
 
 QT5 = QT_VERSION[0] == "5"
@@ -29,6 +28,10 @@ class LabelQLineEdit(QtWidgets.QLineEdit):
 
 
 class LabelDialog(QtWidgets.QDialog):
+    # emitted from the worker thread of the description engine with the request
+    aiFillTextGenerated = QtCore.Signal(object, str)
+    aiFillFinished = QtCore.Signal(object, object)
+
     def __init__(
         self,
         text="Enter object label",
@@ -123,6 +126,9 @@ class LabelDialog(QtWidgets.QDialog):
         ai_button = QtWidgets.QPushButton("AI填充")
         ai_button.setFont(QtGui.QFont("Arial", 14))
         ai_button.clicked.connect(self.setAIFill)
+        self._aiFillRequest = None
+        self.aiFillTextGenerated.connect(self._onAIFillTextGenerated)
+        self.aiFillFinished.connect(self._onAIFillFinished)
         self.ai_buttonLayout.addWidget(ai_button)
         layout.addLayout(self.ai_buttonLayout)
 
@@ -190,12 +196,39 @@ class LabelDialog(QtWidgets.QDialog):
             self.editDescription.setPlainText(description)
 
     def setAIFill(self):
+        # imported on use, as few users generate descriptions
+        from labelme.ai.qwen25 import format_description_prompt
+        from labelme.ai.qwen25 import get_description_engine
+
+        self._cancelAIFill()
         current_description = self.editDescription.toPlainText()
         current_label = self.edit.text()
-        text = generate_response(
-            f"影像中的{current_label} { current_description } ，请用30个字详细描述破损情况。"
+        self.editDescription.clear()
+        self._aiFillRequest = get_description_engine().submit(
+            format_description_prompt(current_label, current_description),
+            on_text=self.aiFillTextGenerated.emit,
+            on_finished=self.aiFillFinished.emit,
         )
-        print(text)
+
+    def _cancelAIFill(self):
+        if self._aiFillRequest is not None:
+            self._aiFillRequest.cancel()
+            self._aiFillRequest = None
+
+    def _onAIFillTextGenerated(self, request, text):
+        if request is not self._aiFillRequest:
+            return
+        cursor = self.editDescription.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+
+    def _onAIFillFinished(self, request, text):
+        if request is not self._aiFillRequest:
+            return
+        self._aiFillRequest = None
+        if text is None:
+            logger.warning("Failed to generate description by AI")
+            return
         self.editDescription.setPlainText(text)
 
     def setLabelText(self, text):
@@ -278,6 +311,7 @@ class LabelDialog(QtWidgets.QDialog):
         return None
 
     def popUp(self, text=None, move=True, flags=None, group_id=None, description=None):
+        self._cancelAIFill()
         if self._fit_to_content["row"]:
             self.labelList.setMinimumHeight(
                 self.labelList.sizeHintForRow(0) * self.labelList.count() + 2
@@ -311,7 +345,9 @@ class LabelDialog(QtWidgets.QDialog):
         self.edit.setFocus(QtCore.Qt.PopupFocusReason)
         if move:
             self.move(QtGui.QCursor.pos())
-        if self.exec_():
+        accepted = self.exec_()
+        self._cancelAIFill()
+        if accepted:
             return (
                 self.edit.text(),
                 self.getFlags(),
@@ -155,7 +155,9 @@ def main():
                 "labelme_draw_label_png=labelme.cli.draw_label_png:main",
                 "labelme_json_to_dataset=labelme.cli.json_to_dataset:main",
                 "labelme_export_json=labelme.cli.export_json:main",
+                "labelme_fill_descriptions=labelme.cli.fill_descriptions:main",
                 "labelme_on_docker=labelme.cli.on_docker:main",
+                "labelme_precompute_embeddings=labelme.cli.precompute_embeddings:main",  # NOQA
             ],
         },
     )
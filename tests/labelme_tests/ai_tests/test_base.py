@@ -0,0 +1,91 @@
+import numpy as np
+
+from labelme.ai import _embedding_cache
+
+from .util import create_efficient_sam
+
+
+def test_predict_from_points_cached(tmp_path, monkeypatch):
+    model = create_efficient_sam(monkeypatch, cache_dir=tmp_path)
+    model.set_image(np.zeros((5, 6, 3), dtype=np.uint8))
+
+    bbox, mask = model.predict_mask_from_points([[2.0, 1.0]], [1])
+    assert bbox == (1, 0, 4, 3)
+    assert mask.shape == (3, 3)
+    assert mask.all()
+    polygon = model.predict_polygon_from_points([[2.01, 1.01]], [1])
+    assert len(polygon) > 0
+    assert model._decoder_session.num_runs == 1
+
+    model.predict_mask_from_points([[2.0, 1.0]], [0])
+    assert model._decoder_session.num_runs == 2
+    model.set_image(np.ones((5, 6, 3), dtype=np.uint8))
+    model.predict_mask_from_points([[2.0, 1.0]], [1])
+    assert model._decoder_session.num_runs == 3
+
+
+def test_predict_from_points_with_image_set_meanwhile(tmp_path, monkeypatch):
+    model = create_efficient_sam(monkeypatch, cache_dir=tmp_path)
+    decoder_session = model._decoder_session
+    image_a = np.zeros((5, 6, 3), dtype=np.uint8)
+    image_b = np.zeros((50, 60, 3), dtype=np.uint8)
+    model.set_image(image_a)
+
+    # e.g., the canvas sets another region while a preview is predicted
+    run = decoder_session.run
+
+    def run_and_set_image(output_names, input_feed):
+        model.set_image(image_b)
+        return run(output_names, input_feed)
+
+    decoder_session.run = run_and_set_image
+    bbox, _ = model.predict_mask_from_points([[2.0, 1.0]], [1])
+    assert bbox == (1, 0, 4, 3)
+    decoder_session.run = run
+
+    # the result is cached for the image that was predicted
+    model.set_image(image_a)
+    assert model.predict_mask_from_points([[2.0, 1.0]], [1])[0] == (1, 0, 4, 3)
+    assert decoder_session.num_runs == 1
+    model.set_image(image_b)
+    model.predict_polygon_from_points([[2.0, 1.0]], [1])
+    assert decoder_session.num_runs == 2
+
+
+def test_prefetch(tmp_path, monkeypatch):
+    model = create_efficient_sam(monkeypatch, cache_dir=tmp_path)
+    encoder_session = model._encoder_session
+    embedding_cache = _embedding_cache.get_embedding_cache()
+    image = np.zeros((5, 6, 3), dtype=np.uint8)
+    key = _embedding_cache.compute_image_key(image)
+
+    # stored only on disk
+    model.prefetch(image)
+    assert encoder_session.num_runs == 1
+    assert embedding_cache.get(model._model_name, key) is not None
+    assert len(model._image_embedding_cache) == 0
+
+    # skipped if cached on disk or in memory
+    model.prefetch(image.copy())
+    assert encoder_session.num_runs == 1
+    model.set_image(image)
+    model.wait_image_embedding()
+    assert encoder_session.num_runs == 1
+    assert key in model._image_embedding_cache
+    model.prefetch(image)
+    assert encoder_session.num_runs == 1
+
+
+def test_predict_from_points_large_image(tmp_path, monkeypatch):
+    model = create_efficient_sam(monkeypatch, cache_dir=tmp_path)
+    model.set_image(np.zeros((1500, 2000, 3), dtype=np.uint8))
+
+    # points are scaled into the reduced size of the decoder
+    bbox, mask = model.predict_mask_from_points([[1500.0, 1000.0]], [1])
+    (input_feed,) = model._decoder_session.input_feeds
+    assert input_feed["orig_im_size"].tolist() == [768, 1024]
+    np.testing.assert_allclose(input_feed["batched_point_coords"][0, 0], [[768, 512]])
+    x1, y1, x2, y2 = bbox
+    assert x1 <= 1500 < x2 and y1 <= 1000 < y2
+    assert x2 - x1 < 10 and y2 - y1 < 10
+    assert mask.shape == (y2 - y1, x2 - x1)
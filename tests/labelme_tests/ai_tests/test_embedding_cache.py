@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+from labelme.ai import _embedding_cache
+
+
+def test_compute_image_key():
+    image = np.zeros((4, 5, 3), dtype=np.uint8)
+    key = _embedding_cache.compute_image_key(image)
+    assert key == _embedding_cache.compute_image_key(image.copy())
+    assert key != _embedding_cache.compute_image_key(image.reshape(5, 4, 3))
+    image = image.copy()
+    image[0, 0, 0] = 1
+    assert key != _embedding_cache.compute_image_key(image)
+
+
+def test_EmbeddingCache(tmp_path):
+    embedding = np.random.rand(1, 4, 8, 8).astype(np.float32)
+    cache = _embedding_cache.EmbeddingCache(
+        cache_dir=str(tmp_path), max_size=embedding.nbytes * 2 + 1024
+    )
+    assert cache.get("SegmentAnything (speed)", "a") is None
+
+    cache.put("SegmentAnything (speed)", "a", embedding)
+    loaded = cache.get("SegmentAnything (speed)", "a")
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, embedding)
+    assert cache.get("EfficientSam (speed)", "a") is None
+
+    path_a = cache._get_path("SegmentAnything (speed)", "a")
+    os.utime(path_a, (0, 0))
+    cache.put("SegmentAnything (speed)", "b", embedding)
+    cache.put("SegmentAnything (speed)", "c", embedding)
+    # the least recently used one is evicted
+    assert cache.get("SegmentAnything (speed)", "a") is None
+    assert cache.get("SegmentAnything (speed)", "b") is not None
+    assert cache.get("SegmentAnything (speed)", "c") is not None
+
+
+def test_compute_image_key_memo():
+    image = np.zeros((4, 5, 3), dtype=np.uint8)
+    key = _embedding_cache.compute_image_key(image)
+    assert id(image) in _embedding_cache._image_keys
+    assert _embedding_cache.compute_image_key(image) == key
+    image_id = id(image)
+    del image
+    assert image_id not in _embedding_cache._image_keys
+
+
+def test_configure(tmp_path, monkeypatch):
+    monkeypatch.setattr(_embedding_cache, "_embedding_cache", None)
+    _embedding_cache.configure(dict(dir=str(tmp_path), max_size=0.5))
+    embedding_cache = _embedding_cache.get_embedding_cache()
+    assert embedding_cache.cache_dir == str(tmp_path)
+    assert embedding_cache.max_size == 512 * 1024**2
+
+    _embedding_cache.configure(None)
+    embedding_cache = _embedding_cache.get_embedding_cache()
+    assert embedding_cache.cache_dir == _embedding_cache.DEFAULT_CACHE_DIR
+    assert embedding_cache.max_size == _embedding_cache.DEFAULT_MAX_SIZE
+
+    with pytest.raises(ValueError):
+        _embedding_cache.configure(dict(max_size=0))
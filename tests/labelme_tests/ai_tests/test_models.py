@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+import labelme.ai
+from labelme.ai import _models
+
+
+def test_MODELS():
+    for model in labelme.ai.MODELS:
+        assert getattr(_models, model.class_name).name == model.name
+    assert labelme.ai.EfficientSamVitT is _models.EfficientSamVitT
+
+
+def test_import_without_backends():
+    code = (
+        "import sys, labelme.ai;"
+        "from labelme.ai import _session;"
+        "[labelme.ai.MODELS[0].name];"
+        "print(sorted({'onnxruntime', 'gdown', 'torch'} & set(sys.modules)))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+    assert output.decode().strip() == "[]"
@@ -0,0 +1,94 @@
+import json
+import os.path as osp
+import threading
+import time
+
+from labelme.ai import qwen25
+from labelme.cli import fill_descriptions
+
+from .util import DescriptionEngine
+
+
+def testDescriptionEngine():
+    engine = DescriptionEngine(idle_timeout=0.2)
+    texts = []
+    finished = []
+    engine.resume.clear()
+    request1 = engine.submit(
+        "1",
+        on_text=lambda request, text: texts.append(text),
+        on_finished=lambda request, text: finished.append(text),
+    )
+    engine.started.wait()
+    request1.cancel()
+    engine.resume.set()
+    assert engine.generate("2") == "a b"
+    assert texts == []
+    assert finished == []
+
+    # the model is kept loaded while used, and unloaded when idle
+    assert engine.generate("3") == "a b"
+    assert engine.num_loads == 1
+    assert engine.loaded
+    time.sleep(0.5)
+    assert not engine.loaded
+    assert engine.generate("4") == "a b"
+    assert engine.num_loads == 2
+
+
+def test_DescriptionEngine_failing_callbacks():
+    engine = DescriptionEngine(idle_timeout=1)
+
+    def fail(request, text):
+        raise RuntimeError("wrapped C/C++ object has been deleted")
+
+    finished = threading.Event()
+    engine.submit("1", on_text=fail, on_finished=fail)
+    engine.submit("2", on_finished=lambda request, text: finished.set())
+    # the worker keeps serving requests
+    assert finished.wait(timeout=5)
+    assert engine.generate("3") == "a b"
+
+
+def test_generate_descriptions(monkeypatch):
+    engine = DescriptionEngine(idle_timeout=0.1)
+    monkeypatch.setattr(qwen25, "get_description_engine", lambda model_name: engine)
+    texts = qwen25.generate_descriptions(
+        [("crack", ""), ("spall", "large"), ("rust", None)], batch_size=2
+    )
+    assert texts == [
+        "generated: " + qwen25.format_description_prompt("crack", ""),
+        "generated: " + qwen25.format_description_prompt("spall", "large"),
+        "generated: " + qwen25.format_description_prompt("rust", ""),
+    ]
+    assert engine.batch_sizes == [2, 1]
+
+
+def test_fill_descriptions(tmp_path, monkeypatch):
+    engine = DescriptionEngine(idle_timeout=0.1)
+    monkeypatch.setattr(qwen25, "get_description_engine", lambda model_name: engine)
+    filenames = []
+    for i, descriptions in enumerate([["", "done"], [None, ""], ["done"]]):
+        filename = str(tmp_path / "{}.json".format(i))
+        shapes = [
+            {"label": "crack", "points": [[0, 0]], "description": description}
+            for description in descriptions
+        ]
+        with open(filename, "w") as f:
+            json.dump({"shapes": shapes, "imagePath": "{}.jpg".format(i)}, f)
+        filenames.append(filename)
+
+    assert fill_descriptions.fill_descriptions(filenames, batch_size=2) == 3
+    assert engine.batch_sizes == [2, 1]
+    prompt = qwen25.format_description_prompt("crack")
+    descriptions = []
+    for filename in filenames:
+        with open(filename) as f:
+            data = json.load(f)
+        assert data["imagePath"] == osp.splitext(osp.basename(filename))[0] + ".jpg"
+        descriptions.append([shape["description"] for shape in data["shapes"]])
+    assert descriptions == [
+        ["generated: " + prompt, "done"],
+        ["generated: " + prompt, "generated: " + prompt],
+        ["done"],
+    ]
@@ -0,0 +1,50 @@
+import onnxruntime
+import pytest
+
+from labelme.ai import _session
+
+
+def test_get_session_options():
+    config = dict(
+        _session.DEFAULT_CONFIG,
+        intra_op_num_threads=32,
+        graph_optimization_level="extended",
+        enable_cpu_mem_arena=False,
+        allow_spinning=False,
+    )
+    sess_options = _session.get_session_options(config)
+    assert sess_options.intra_op_num_threads == 32
+    assert (
+        sess_options.graph_optimization_level
+        == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    )
+    assert not sess_options.enable_cpu_mem_arena
+    assert (
+        sess_options.get_session_config_entry("session.intra_op.allow_spinning") == "0"
+    )
+
+
+def test_get_providers():
+    config = dict(
+        _session.DEFAULT_CONFIG,
+        providers=[
+            "UnknownExecutionProvider",
+            {"CPUExecutionProvider": {"arena_extend_strategy": "kSameAsRequested"}},
+        ],
+    )
+    assert _session.get_providers(config) == [
+        ("CPUExecutionProvider", {"arena_extend_strategy": "kSameAsRequested"})
+    ]
+    config["providers"] = []
+    assert _session.get_providers(config) == [("CPUExecutionProvider", {})]
+
+
+def test_configure():
+    try:
+        _session.configure({"intra_op_num_threads": 4})
+        assert _session._config["intra_op_num_threads"] == 4
+        assert _session._config["providers"] == ["CPUExecutionProvider"]
+        with pytest.raises(ValueError):
+            _session.configure({"graph_optimization_level": "fast"})
+    finally:
+        _session.configure(None)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from labelme.ai import _tiling
+
+from .util import create_efficient_sam
+
+
+@pytest.fixture
+def tiling_config():
+    _tiling.configure({"min_image_size": 64, "tile_size": 32})
+    yield
+    _tiling.configure(None)
+
+
+def test_get_tile_box(tiling_config):
+    assert _tiling.is_tiled((65, 10))
+    assert not _tiling.is_tiled((64, 64, 3))
+
+    # tiles are on the grid of half the tile size
+    assert _tiling.get_tile_box((100, 200), [(50, 50)]) == (32, 32, 64, 64)
+    assert _tiling.get_tile_box((100, 200), [(55, 57)]) == (32, 48, 64, 80)
+    # clipped by the image
+    assert _tiling.get_tile_box((100, 200), [(1, 99)]) == (0, 68, 32, 100)
+    # enlarged to cover the points
+    assert _tiling.get_tile_box((100, 200), [(10, 10), (40, 20)]) == (
+        0,
+        0,
+        48,
+        48,
+    )
+    assert _tiling.get_tile_box((20, 10), [(5, 5)]) == (0, 0, 10, 20)
+
+
+def test_EfficientSam_tiled(tiling_config, tmp_path, monkeypatch):
+    model = create_efficient_sam(monkeypatch, cache_dir=tmp_path)
+
+    model.set_image(np.zeros((100, 200, 3), dtype=np.uint8))
+    assert model._state.thread is None
+
+    bbox, mask = model.predict_mask_from_points([[50, 50]], [1])
+    assert bbox == (49, 49, 52, 52)
+    assert mask.shape == (3, 3)
+    assert mask.all()
+    assert model._encoder_session.image_shapes == [(32, 32)]
+
+    polygon = model.predict_polygon_from_points([[150, 60]], [1])
+    assert (polygon.min(axis=0) >= (148, 58)).all()
+    assert (polygon.max(axis=0) <= (153, 63)).all()
+    # the tile of the first prompt is reused
+    model.predict_polygon_from_points([[55, 50]], [1])
+    assert model._encoder_session.image_shapes == [(32, 32), (32, 32)]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from labelme.ai import _utils
+
+
+def test_LRUCache():
+    cache = _utils.LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    # the least recently used one is evicted
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_quantize_points():
+    assert _utils.quantize_points([[1.1, 2.0], [3.0, 4.4]]) == (
+        (1.0, 2.0),
+        (3.0, 4.5),
+    )
+    assert _utils.quantize_points([[1.1, 2.0]]) == _utils.quantize_points(
+        [[1.05, 1.95]]
+    )
+
+
+def test_get_reduced_size():
+    assert _utils.get_reduced_size((4000, 3000)) == (1024, 768)
+    assert _utils.get_reduced_size((500, 300, 3)) == (500, 300)
+
+
+def test_compute_mask_from_logits():
+    logits = np.full((10, 20), -1, dtype=np.float32)
+    logits[2:6, 2:12] = 1
+    logits[8, 18] = 1  # removed as a small object
+
+    # upsampled by 4 only around the mask
+    bbox, mask = _utils.compute_mask_from_logits(logits, image_shape=(40, 80))
+    assert bbox == (8, 8, 48, 24)
+    assert mask.shape == (16, 40)
+    assert mask[1:-1].all()  # corners are rounded by the interpolation
+
+    bbox, mask = _utils.compute_mask_from_logits(
+        np.full((10, 20), -1, dtype=np.float32), image_shape=(40, 80)
+    )
+    assert bbox == (0, 0, 0, 0)
+    assert mask.shape == (0, 0)
+
+
+def test_compute_polygon_from_mask():
+    mask = np.zeros((100, 120), dtype=bool)
+    mask[10:20, 30:50] = True
+
+    polygon = _utils.compute_polygon_from_mask(mask)
+    # on the boundaries of pixels in the bounding box of the mask
+    np.testing.assert_allclose(polygon.min(axis=0), [29.5, 9.5])
+    np.testing.assert_allclose(polygon.max(axis=0), [49.5, 19.5])
+    # cached for the same mask
+    assert _utils.compute_polygon_from_mask(mask) is polygon
+    assert _utils.compute_polygon_from_mask(mask.copy()) is not polygon
+
+    polygon = _utils.compute_polygon_from_mask(np.zeros((10, 10), dtype=bool))
+    assert polygon.shape == (0, 2)
+
+
+@pytest.mark.parametrize("backend", ["skimage", "opencv"])
+def test_compute_polygon_from_mask_backend(backend):
+    if backend == "opencv":
+        pytest.importorskip("cv2")
+    mask = np.zeros((100, 120), dtype=bool)
+    mask[10:60, 30:50] = True
+    mask[40:60, 50:100] = True
+
+    _utils.configure_polygon(dict(backend=backend))
+    try:
+        polygon = _utils.compute_polygon_from_mask(mask)
+    finally:
+        _utils.configure_polygon(None)
+    assert 6 <= len(polygon) <= 12
+    assert np.all(polygon.min(axis=0) >= [29.5, 9.5])
+    assert np.all(polygon.max(axis=0) <= [99.5, 59.5])
+
+
+def test_configure_polygon():
+    with pytest.raises(ValueError):
+        _utils.configure_polygon(dict(backend="unknown"))
+    with pytest.raises(ValueError):
+        _utils.configure_polygon(dict(tolerance=-1))
@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+
+from labelme.ai import _embedding_cache
+from labelme.ai import _session
+from labelme.ai import efficient_sam
+from labelme.ai import qwen25
+
+
+class EncoderSession(object):
+    def __init__(self):
+        self.image_shapes = []
+
+    @property
+    def num_runs(self):
+        return len(self.image_shapes)
+
+    def run(self, output_names, input_feed):
+        self.image_shapes.append(input_feed["batched_images"].shape[2:])
+        return (np.full((1, 1), self.num_runs, dtype=np.float32),)
+
+
+class DecoderSession(object):
+    # mask of 3x3 pixels around the first point, in the frame of orig_im_size
+    # as normalized by the decoder of EfficientSam
+    def __init__(self):
+        self.input_feeds = []
+
+    @property
+    def num_runs(self):
+        return len(self.input_feeds)
+
+    def run(self, output_names, input_feed):
+        self.input_feeds.append(input_feed)
+        height, width = input_feed["orig_im_size"]
+        x, y = np.round(input_feed["batched_point_coords"][0, 0, 0]).astype(int)
+        masks = np.full((1, 1, 3, height, width), -1, dtype=np.float32)
+        masks[..., max(0, y - 1) : y + 2, max(0, x - 1) : x + 2] = 1
+        return masks, None, None
+
+
+def create_efficient_sam(monkeypatch, cache_dir):
+    # with fake sessions and an embedding cache in cache_dir
+    monkeypatch.setattr(
+        _embedding_cache,
+        "_embedding_cache",
+        _embedding_cache.EmbeddingCache(cache_dir=str(cache_dir)),
+    )
+    sessions = dict(encoder=EncoderSession(), decoder=DecoderSession())
+    monkeypatch.setattr(_session, "create_session", sessions.get)
+    return efficient_sam.EfficientSam(encoder_path="encoder", decoder_path="decoder")
+
+
+class DescriptionEngine(qwen25.DescriptionEngine):
+    # generates texts without loading models, and can be paused by resume
+    def __init__(self, texts=("a ", "b"), **kwargs):
+        super().__init__(**kwargs)
+        self.texts = texts
+        self.num_loads = 0
+        self.started = threading.Event()
+        self.resume = threading.Event()
+        self.resume.set()
+        self.batch_sizes = []
+
+    def _generate(self, request):
+        if self._model is None:
+            self.num_loads += 1
+            self._model = self._tokenizer = object()
+        self.started.set()
+        self.resume.wait()
+        if isinstance(request.prompt, list):
+            self.batch_sizes.append(len(request.prompt))
+            return ["generated: " + prompt for prompt in request.prompt]
+        for text in self.texts:
+            if request.cancelled:
+                raise qwen25._Cancelled
+            if request.on_text:
+                request._call(request.on_text, text)
+        return "".join(self.texts)
@@ -112,3 +112,74 @@ def test_MainWindow_annotate_jpg(qtbot):
 
     labelme.testing.assert_labelfile_sanity(out_file)
     shutil.rmtree(tmp_dir)
+
+
+class _PrefetchModel(object):
+    def __init__(self):
+        self.calls = []
+        self.images = []
+
+    def wait_image_embedding(self):
+        self.calls.append("wait_image_embedding")
+
+    def prefetch(self, image):
+        self.calls.append("prefetch")
+        self.images.append(image)
+
+
+@pytest.mark.gui
+def test_MainWindow_prefetchAiEmbedding(qtbot):
+    win = labelme.app.MainWindow()
+    qtbot.addWidget(win)
+    model = _PrefetchModel()
+    img_file = osp.join(data_dir, "raw/2011_000003.jpg")
+
+    win._prefetchAiEmbedding(model, img_file, win._prefetchGeneration)
+    assert len(model.images) == 1
+    assert model.images[0].shape == (338, 500, 4)
+    # after the embedding of the current image
+    assert model.calls == ["wait_image_embedding", "prefetch"]
+
+    # cancelled by the generation bumped by opening another image
+    generation = win._prefetchGeneration
+    win._prefetchGeneration += 1
+    win._prefetchAiEmbedding(model, img_file, generation)
+    assert len(model.images) == 1
+
+
+@pytest.mark.gui
+def test_MainWindow_deleteFile_after_auto_save(qtbot, tmp_path, monkeypatch):
+    directory = str(tmp_path / "raw")
+    shutil.copytree(osp.join(data_dir, "raw"), directory)
+    config = labelme.config.get_default_config()
+    config["auto_save"] = True
+    win = labelme.app.MainWindow(config=config, filename=directory)
+    qtbot.addWidget(win)
+    _win_show_and_wait_imageData(qtbot, win)
+
+    win.loadLabels(
+        [
+            dict(
+                label="whole",
+                group_id=None,
+                points=[(100, 100), (100, 238), (400, 238), (400, 100)],
+                shape_type="polygon",
+                mask=None,
+                flags={},
+                other_data={},
+            )
+        ]
+    )
+    win.setDirty()  # saved in the background
+
+    monkeypatch.setattr(
+        labelme.app.QtWidgets.QMessageBox,
+        "warning",
+        lambda *args: labelme.app.QtWidgets.QMessageBox.Yes,
+    )
+    label_file = win.getLabelFile()
+    item = win.fileListWidget.currentItem()
+    win.deleteFile()
+    qtbot.wait(100)  # for the signal of the save
+    assert not osp.exists(label_file)
+    assert item.checkState() == labelme.app.Qt.Unchecked
@@ -0,0 +1,280 @@
+import json
+import os.path as osp
+
+import numpy as np
+
+from labelme import label_file as label_file_module
+from labelme.label_file import LabelFile
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def test_LabelFile_load_lazy():
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+
+    label_file = LabelFile(json_file, lazy=True)
+    assert label_file._imageDataLoader is not None
+    assert len(label_file.shapes) > 0
+    assert label_file.imageHeight == 907
+    assert label_file.imageWidth == 1210
+
+    eager_label_file = LabelFile(json_file)
+    assert label_file.imageData == eager_label_file.imageData
+    assert label_file._imageDataLoader is None
+
+    image_array = label_file.image_array
+    assert image_array.dtype == np.uint8
+    assert image_array.shape == (907, 1210, 3)
+
+
+def test_LabelFile_load_lazy_image_path():
+    json_file = osp.join(data_dir, "annotated/2011_000003.json")
+
+    label_file = LabelFile(json_file, lazy=True)
+    assert label_file._imageDataLoader is not None
+    assert label_file.image_array.shape[:2] == (
+        label_file.imageHeight,
+        label_file.imageWidth,
+    )
+
+
+def test_LabelFile_load_image_file():
+    img_file = osp.join(data_dir, "raw/2011_000003.jpg")
+    with open(img_file, "rb") as f:
+        img_data = f.read()
+    # no exif rotation, so the original bytes are returned without re-encoding
+    assert LabelFile.load_image_file(img_file) == img_data
+
+
+def test_LabelFile_save_data_file(tmp_path):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    label_file = LabelFile(json_file)
+
+    mask = np.zeros((5, 7), dtype=bool)
+    mask[1:4, 2:6] = True
+    shapes = label_file.shapes + [
+        dict(
+            label="mask",
+            points=[[10, 10], [16, 14]],
+            shape_type="mask",
+            flags={},
+            description="",
+            group_id=None,
+            mask=mask,
+        )
+    ]
+
+    out_file = str(tmp_path / "apc2016_obj3.json")
+    LabelFile().save(
+        filename=out_file,
+        shapes=shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        imageData=label_file.imageData,
+        data_file=True,
+    )
+    with open(out_file) as f:
+        data_file = str(tmp_path / json.load(f)["dataFile"])
+    assert {p.name for p in tmp_path.iterdir()} == {
+        "apc2016_obj3.json",
+        osp.basename(data_file),
+    }
+
+    for lazy in [False, True]:
+        loaded = LabelFile(out_file, lazy=lazy)
+        assert loaded.imageData == label_file.imageData
+        assert len(loaded.shapes) == len(shapes)
+        np.testing.assert_array_equal(loaded.shapes[-1]["mask"], mask)
+        assert loaded.otherData == {}
+
+    # the previous data file is removed after the new JSON is written
+    mask = mask.copy()
+    mask[0, 0] = True
+    shapes[-1]["mask"] = mask
+    LabelFile().save(
+        filename=out_file,
+        shapes=shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        imageData=label_file.imageData,
+        data_file=True,
+    )
+    with open(out_file) as f:
+        new_data_file = str(tmp_path / json.load(f)["dataFile"])
+    assert new_data_file != data_file
+    assert {p.name for p in tmp_path.iterdir()} == {
+        "apc2016_obj3.json",
+        osp.basename(new_data_file),
+    }
+    np.testing.assert_array_equal(LabelFile(out_file).shapes[-1]["mask"], mask)
+
+
+def test_LabelFile_save_mask_codec(tmp_path):
+    mask = np.zeros((5, 7), dtype=bool)
+    mask[0, 0] = True
+    mask[1:4, 2:6] = True
+    shapes = [
+        dict(
+            label="mask",
+            points=[[10, 10], [16, 14]],
+            shape_type="mask",
+            flags={},
+            description="",
+            group_id=None,
+            mask=mask,
+        )
+    ]
+    img_file = osp.join(data_dir, "raw/2011_000003.jpg")
+
+    for mask_codec in LabelFile.mask_codecs:
+        out_file = str(tmp_path / "{}.json".format(mask_codec))
+        LabelFile().save(
+            filename=out_file,
+            shapes=shapes,
+            imagePath=img_file,
+            imageHeight=None,
+            imageWidth=None,
+            mask_codec=mask_codec,
+        )
+        loaded = LabelFile(out_file, lazy=True)
+        np.testing.assert_array_equal(loaded.shapes[0]["mask"], mask)
+
+
+def test_LabelFile_save_atomic(tmp_path):
+    json_file = osp.join(data_dir, "annotated/2011_000003.json")
+    label_file = LabelFile(json_file)
+
+    out_file = tmp_path / "2011_000003.json"
+    out_file.write_text("{")
+    for _ in range(2):
+        LabelFile().save(
+            filename=str(out_file),
+            shapes=label_file.shapes,
+            imagePath=label_file.imagePath,
+            imageHeight=label_file.imageHeight,
+            imageWidth=label_file.imageWidth,
+        )
+    # no temporary files are left behind
+    assert [p.name for p in tmp_path.iterdir()] == [out_file.name]
+    with open(str(out_file)) as f:
+        data = json.load(f)
+    assert len(data["shapes"]) == len(label_file.shapes)
+
+
+def test_LabelFile_load_shape_record(tmp_path):
+    json_file = osp.join(data_dir, "annotated/2011_000003.json")
+    with open(json_file) as f:
+        data = json.load(f)
+    label_file = LabelFile(json_file)
+
+    shape = label_file.shapes[0]
+    assert shape.points.dtype == np.float32
+    assert shape.points.shape == (len(data["shapes"][0]["points"]), 2)
+    assert shape["label"] == shape.label == data["shapes"][0]["label"]
+    assert shape.get("group_id") == data["shapes"][0]["group_id"]
+    assert "points" in shape
+    assert "imagePath" not in shape
+
+    out_file = str(tmp_path / "2011_000003.json")
+    label_file.save(
+        filename=out_file,
+        shapes=label_file.shapes,
+        imagePath=label_file.imagePath,
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+    )
+    with open(out_file) as f:
+        saved = json.load(f)
+    for s, s_saved in zip(data["shapes"], saved["shapes"]):
+        np.testing.assert_allclose(s_saved["points"], s["points"], rtol=1e-6)
+
+
+def test_LabelFile_load_shape_record_rectangle(tmp_path):
+    json_file = str(tmp_path / "rectangle.json")
+    shape = dict(
+        label="box",
+        points=[[10.5, 20.25], [30.1, 40.0]],
+        group_id=None,
+        description="",
+        shape_type="rectangle",
+        flags={},
+        mask=None,
+    )
+    with open(osp.join(data_dir, "annotated/2011_000003.json")) as f:
+        data = json.load(f)
+    data["shapes"] = [shape]
+    data["imagePath"] = osp.join(data_dir, "annotated", data["imagePath"])
+    with open(json_file, "w") as f:
+        json.dump(data, f)
+    label_file = LabelFile(json_file)
+
+    # accessed like a dict loaded from the file, e.g., by labelme2coco
+    (record,) = label_file.shapes
+    (x1, y1), (x2, y2) = record["points"]
+    assert json.loads(json.dumps([x1, y1, x2, y1, x2, y2, x1, y2])) == [
+        10.5,
+        20.25,
+        30.1,
+        20.25,
+        30.1,
+        40.0,
+        10.5,
+        40.0,
+    ]
+    assert record["points"] == shape["points"]
+    assert dict(record, other_data={}) == dict(shape, other_data={})
+    assert record == LabelFile(json_file).shapes[0]
+    json.dumps(dict(record))
+
+    record["points"] = [[0, 0], [1, 2]]
+    assert record.points.dtype == np.float32
+    assert record["points"] == [[0.0, 0.0], [1.0, 2.0]]
+
+
+def test_LabelFile_encode_mask_cache():
+    mask = np.zeros((5, 7), dtype=bool)
+    mask[1:4, 2:6] = True
+    for mask_codec in LabelFile.mask_codecs:
+        encoded = LabelFile._encode_mask(mask, mask_codec=mask_codec)
+        assert LabelFile._encode_mask(mask, mask_codec=mask_codec) is encoded
+        assert LabelFile._encode_mask(mask.copy(), mask_codec=mask_codec) == encoded
+
+
+def test_scan_label_file(tmp_path, monkeypatch):
+    json_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.json")
+    with open(json_file) as f:
+        data = json.load(f)
+    data["otherData"] = {"note": 'a "quoted" \\ string\\\\'}
+    data["imagePath"] = 'escaped\\"path\\\\'
+    out_file = str(tmp_path / "apc2016_obj3.json")
+    with open(out_file, "w") as f:
+        json.dump(data, f, indent=2)
+
+    for chunk_size in [7, 1024 * 1024]:
+        monkeypatch.setattr(
+            label_file_module._LabelFileScanner, "chunk_size", chunk_size
+        )
+        result = label_file_module.scan_label_file(out_file)
+        assert result == (
+            out_file,
+            data["shapes"],
+            data["flags"],
+            data["imageHeight"],
+            data["imageWidth"],
+        )
+
+
+def test_scan_label_files():
+    json_dir = osp.join(data_dir, "annotated")
+    results = list(label_file_module.scan_label_files(json_dir, processes=2))
+    assert [osp.basename(r[0]) for r in results] == [
+        "2011_000003.json",
+        "2011_000006.json",
+        "2011_000025.json",
+    ]
+    for filename, shapes, _, _, _ in results:
+        with open(filename) as f:
+            assert shapes == json.load(f)["shapes"]
@@ -0,0 +1,51 @@
+import json
+import os.path as osp
+import shutil
+
+import pytest
+
+from labelme.label_file import LabelFile
+from labelme.label_store import LabelStore
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "data")
+
+
+def test_LabelStore(tmp_path):
+    root = tmp_path / "annotated"
+    shutil.copytree(osp.join(data_dir, "annotated"), str(root))
+    json_file = str(root / "2011_000003.json")
+
+    store = LabelStore(str(root / "labels.db"))
+    assert store.import_json_dir(str(root)) == 3
+    assert json_file in store
+    assert sorted(store.keys())[0] == "2011_000003.json"
+
+    label_file = LabelFile(json_file, store=store)
+    expected = LabelFile(json_file)
+    assert [s.label for s in label_file.shapes] == [s.label for s in expected.shapes]
+    assert label_file.imageData == expected.imageData
+
+    out_file = str(root / "sub" / "out.json")
+    label_file.save(
+        filename=out_file,
+        shapes=label_file.shapes[:1],
+        imagePath=osp.join("..", label_file.imagePath),
+        imageHeight=label_file.imageHeight,
+        imageWidth=label_file.imageWidth,
+        store=store,
+    )
+    assert not osp.exists(out_file)
+    assert len(LabelFile(out_file, store=store).shapes) == 1
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.delete(json_file)
+            raise RuntimeError
+    assert json_file in store
+
+    export_dir = tmp_path / "exported"
+    assert store.export_json_dir(str(export_dir)) == 4
+    with open(str(export_dir / "sub" / "out.json")) as f:
+        assert len(json.load(f)["shapes"]) == 1
+    store.close()
@@ -0,0 +1,36 @@
+from qtpy import QtCore
+
+from labelme.shape import Shape
+
+
+def test_Shape_serialized():
+    shape = Shape(label="a", shape_type="polygon")
+    shape.setPointsArray([[0, 0], [10, 0], [10, 10], [0, 0]])
+    assert len(shape) == 3
+
+    shape.serialized = {}
+    shape.selected = True
+    assert shape.serialized == {}
+
+    shape.moveVertexBy(0, QtCore.QPointF(1, 1))
+    assert shape.serialized is None
+    assert shape.points[0] == QtCore.QPointF(1, 1)
+
+    shape.serialized = {}
+    shape.label = "b"
+    assert shape.serialized is None
+
+    shape.serialized = {}
+    shape.copy().insertPoint(1, QtCore.QPointF(5, 0))
+    assert shape.serialized == {}
+
+
+def test_Shape_pointsToList():
+    shape = Shape(label="a", shape_type="polygon")
+    shape.setPointsArray([[0, 0], [10.1, 0], [10, 10]])
+    # without converting the points to QPointF
+    assert shape.pointsToList() == [[0, 0], [10.1, 0], [10, 10]]
+    assert shape._points_array is not None
+
+    shape.points = [QtCore.QPointF(1, 2)]
+    assert shape.pointsToList() == [[1, 2]]
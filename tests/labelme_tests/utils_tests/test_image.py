@@ -29,3 +29,52 @@ def test_img_data_to_png_data():
         img_data = f.read()
     png_data = image_module.img_data_to_png_data(img_data)
     assert isinstance(png_data, bytes)
+
+
+def test_img_data_to_shape():
+    img_file = osp.join(data_dir, "annotated_with_data/apc2016_obj3.jpg")
+    with open(img_file, "rb") as f:
+        img_data = f.read()
+    assert image_module.img_data_to_shape(img_data) == (907, 1210)
+
+
+def test_mask_to_rle():
+    mask = np.zeros((4, 4), dtype=bool)
+    mask[1:3, 1:3] = True
+
+    rle = image_module.mask_to_rle(mask, compress=False)
+    assert rle == dict(size=[4, 4], counts=[5, 2, 2, 2, 5])
+    np.testing.assert_array_equal(image_module.rle_to_mask(rle), mask)
+
+    rle = image_module.mask_to_rle(mask)
+    assert rle == dict(size=[4, 4], counts="52203")  # same as pycocotools
+    np.testing.assert_array_equal(image_module.rle_to_mask(rle), mask)
+
+
+def test_img_arr_to_qt():
+    img_arr = np.random.RandomState(0).randint(0, 256, (5, 7, 3)).astype(np.uint8)
+    img_qt = image_module.img_arr_to_qt(img_arr)
+    assert (img_qt.width(), img_qt.height()) == (7, 5)
+    # rows of an odd width of RGB888 are padded in copies made in Qt
+    img_qt = img_qt.copy()
+    assert img_qt.bytesPerLine() == 24
+
+    img_arr2 = image_module.img_qt_to_arr(img_qt)
+    assert not img_arr2.flags.writeable
+    np.testing.assert_array_equal(img_arr2, img_arr)
+
+    # the array keeps the buffer alive without the QImage
+    del img_qt
+    np.testing.assert_array_equal(img_arr2, img_arr)
+
+
+def test_img_qt_to_arr():
+    img_arr = np.zeros((3, 2, 4), dtype=np.uint8)
+    img_arr[..., 0] = 255
+    img_arr[..., 3] = 255
+    img_qt = image_module.img_arr_to_qt(img_arr)
+    img_qt = img_qt.convertToFormat(img_qt.Format_ARGB32)
+    # bytes are in the order of the format: BGRA for ARGB32 on little endian
+    img_arr2 = image_module.img_qt_to_arr(img_qt)
+    assert img_arr2.shape == (3, 2, 4)
+    np.testing.assert_array_equal(img_arr2[0, 0], [0, 0, 255, 255])
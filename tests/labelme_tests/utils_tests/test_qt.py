@@ -0,0 +1,22 @@
+import os.path as osp
+
+from labelme.utils import qt as qt_module
+
+here = osp.dirname(osp.abspath(__file__))
+data_dir = osp.join(here, "../data")
+
+
+def test_scanAllImages():
+    images = qt_module.scanAllImages(osp.join(data_dir, "raw"))
+    assert [osp.basename(image) for image in images] == [
+        "2011_000003.jpg",
+        "2011_000006.jpg",
+        "2011_000025.jpg",
+    ]
+
+
+def test_imageDataToPixmapArray():
+    with open(osp.join(data_dir, "raw/2011_000003.jpg"), "rb") as f:
+        image = qt_module.imageDataToPixmapArray(f.read())
+    assert image.shape == (338, 500, 4)
+    assert qt_module.imageDataToPixmapArray(b"") is None
@@ -1,3 +1,5 @@
+import numpy as np
+
 from labelme.utils import shape as shape_module
 
 from .util import get_img_and_data
@@ -22,3 +24,8 @@ def test_shape_to_mask():
         points = shape["points"]
         mask = shape_module.shape_to_mask(img.shape[:2], points)
         assert mask.shape == img.shape[:2]
+
+
+def test_points_to_list():
+    points = np.array([[0.1, 123.456], [5000.75, 2]], dtype=np.float32)
+    assert shape_module.points_to_list(points) == [[0.1, 123.456], [5000.75, 2.0]]
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+from qtpy import QtCore
+from qtpy import QtGui
+
+from labelme.ai import _tiling
+from labelme.shape import Shape
+from labelme.widgets import Canvas
+
+
+class _PolygonModel(object):
+    def __init__(self):
+        self.n_calls = 0
+        self.images = []
+
+    def set_image(self, image):
+        self.images.append(image)
+
+    def predict_polygon_from_points(self, points, point_labels):
+        self.n_calls += 1
+        x, y = points[-1]
+        return np.array([[x, y], [x + 10, y], [x + 10, y + 10], [x, y + 10]])
+
+
+@pytest.mark.gui
+def test_Canvas_ai_preview(qtbot):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    pixmap = QtGui.QPixmap(100, 100)
+    pixmap.fill(QtGui.QColor(0, 0, 0))
+    canvas.loadPixmap(pixmap)
+    canvas._ai_model = model = _PolygonModel()
+    canvas.createMode = "ai_polygon"
+    canvas.current = Shape(shape_type="points")
+    canvas.current.addPoint(QtCore.QPointF(10, 10))
+    canvas.line.points = [QtCore.QPointF(10, 10), QtCore.QPointF(20, 20)]
+    canvas.line.point_labels = [1, 1]
+    canvas.show()
+
+    # painting neither sets the image nor predicts, but the result arrives later
+    canvas.repaint()
+    assert model.images == []
+    qtbot.waitUntil(lambda: len(canvas._aiPreviewResults) == 1)
+    assert len(model.images) == 1
+    assert model.n_calls == 1
+
+    # the cached result is used for the same points
+    canvas.repaint()
+    assert len(canvas._aiPreviewResults) == 1
+    assert model.n_calls == 1
+
+
+@pytest.mark.gui
+def test_Canvas_ai_region(qtbot):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    pixmap = QtGui.QPixmap(400, 300)
+    pixmap.fill(QtGui.QColor(0, 0, 0))
+    canvas.loadPixmap(pixmap)
+    canvas._ai_model = model = _PolygonModel()
+    canvas.resize(400, 300)
+    canvas.show()
+
+    # the whole image is visible
+    canvas._updateAiRegion()
+    assert canvas._ai_region == (0, 0, 400, 300)
+    assert model.images[-1].shape[:2] == (300, 400)
+
+    # zoomed in to the top-left quarter
+    canvas.scale = 4
+    canvas._updateAiRegion()
+    assert canvas._ai_region == (0, 0, 151, 113)
+    assert model.images[-1].shape[:2] == (113, 151)
+
+    # the region is kept while prompts are inside it
+    canvas._updateAiRegion([(140, 100)])
+    assert len(model.images) == 2
+    canvas._updateAiRegion([(200, 100)])
+    assert canvas._ai_region == (0, 0, 201, 113)
+    assert len(model.images) == 3
+
+
+@pytest.mark.gui
+def test_Canvas_ai_region_tiled(qtbot, monkeypatch):
+    monkeypatch.setattr(_tiling, "_config", dict(min_image_size=256, tile_size=64))
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    pixmap = QtGui.QPixmap(400, 300)
+    pixmap.fill(QtGui.QColor(0, 0, 0))
+    canvas.loadPixmap(pixmap)
+    canvas._ai_model = model = _PolygonModel()
+    canvas.resize(400, 300)
+    canvas.show()
+
+    # zoomed in, the whole image is tiled at its resolution instead of the
+    # region being downsized by the model
+    canvas.scale = 4
+    canvas._updateAiRegion()
+    assert canvas._ai_region == (0, 0, 400, 300)
+    assert model.images[-1].shape[:2] == (300, 400)
+    canvas._updateAiRegion([(140, 100)])
+    assert len(model.images) == 1
+
+
+@pytest.mark.gui
+def test_Canvas_ai_region_switching_models(qtbot):
+    canvas = Canvas()
+    qtbot.addWidget(canvas)
+    pixmap = QtGui.QPixmap(400, 300)
+    pixmap.fill(QtGui.QColor(0, 0, 0))
+    canvas.loadPixmap(pixmap)
+    canvas.resize(400, 300)
+    canvas.show()
+
+    canvas._ai_model = model_a = _PolygonModel()
+    canvas._updateAiRegion(force=True)
+    canvas._ai_model = model_b = _PolygonModel()
+    canvas._updateAiRegion(force=True)
+    # the same region and array are given to the new model
+    assert len(model_a.images) == 1
+    assert len(model_b.images) == 1
+    assert model_b.images[0] is model_a.images[0]
+
+    canvas._updateAiRegion(force=True)
+    assert len(model_b.images) == 1
+
+
+class _MaskModel(object):
+    def predict_mask_from_points(self, points, point_labels):
+        x, y = np.array(points[0], dtype=int)
+        return (x, y, x + 3, y + 2), np.ones((2, 3), dtype=bool)
+
+
+def test_predictAiShape():
+    from labelme.widgets.canvas import _predictAiShape
+
+    # the model is given the region from (100, 200) downsized by half
+    (x1, y1, x2, y2), mask = _predictAiShape(
+        _MaskModel(), (100, 200, 0.5, 0.5), "ai_mask", [(120, 240)], [1]
+    )
+    assert (x1, y1, x2, y2) == (120, 240, 125, 243)
+    assert mask.shape == (4, 6)
+    assert mask.all()
+
+    polygon = _predictAiShape(
+        _PolygonModel(), (100, 200, 0.5, 0.5), "ai_polygon", [(120, 240)], [1]
+    )
+    np.testing.assert_allclose(
+        polygon, [[120, 240], [140, 240], [140, 260], [120, 260]]
+    )
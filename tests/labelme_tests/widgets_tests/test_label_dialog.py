@@ -2,9 +2,12 @@ import pytest
 from qtpy import QtCore
 from qtpy import QtWidgets
 
+from labelme.ai import qwen25
 from labelme.widgets import LabelDialog
 from labelme.widgets import LabelQLineEdit
 
+from ..ai_tests.util import DescriptionEngine
+
 
 @pytest.mark.gui
 def test_LabelQLineEdit(qtbot):
@@ -91,3 +94,20 @@ def test_LabelDialog_popUp(qtbot):
     assert flags == {}
     assert group_id is None
     assert description == ""
+
+
+@pytest.mark.gui
+def test_LabelDialog_setAIFill(qtbot, monkeypatch):
+    engine = DescriptionEngine(texts=("cracked ", "wall"), idle_timeout=0.1)
+    monkeypatch.setattr(qwen25, "get_description_engine", lambda: engine)
+    widget = LabelDialog(labels=["wall"])
+    qtbot.addWidget(widget)
+
+    texts = []
+    widget.aiFillTextGenerated.connect(lambda request, text: texts.append(text))
+    widget.edit.setText("wall")
+    with qtbot.waitSignal(widget.aiFillFinished):
+        widget.setAIFill()
+    qtbot.waitUntil(lambda: widget._aiFillRequest is None)
+    assert texts == ["cracked ", "wall"]
+    assert widget.editDescription.toPlainText() == "cracked wall"